@@ -24,8 +24,16 @@ CREATE TABLE IF NOT EXISTS pdf_files (
     name VARCHAR(255) NOT NULL,
     file_path VARCHAR(500) NOT NULL,
     uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    size_bytes BIGINT,
     summary TEXT,
-    summary_generated_at TIMESTAMP
+    summary_generated_at TIMESTAMP,
+    -- Filled by the background ingestion job after upload
+    ingest_status VARCHAR(20) NOT NULL DEFAULT 'pending', -- pending, processing, ready, failed
+    ingest_error TEXT,
+    ingested_at TIMESTAMP,
+    page_count INTEGER,
+    word_count INTEGER,
+    content_sha256 CHAR(64)
 );
 
 -- Create goals table
@@ -55,6 +63,18 @@ CREATE TABLE IF NOT EXISTS quiz_sessions (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Generated summaries, one per file / requested length / model
+CREATE TABLE IF NOT EXISTS pdf_summaries (
+    id SERIAL PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES pdf_files(id) ON DELETE CASCADE,
+    max_length INTEGER NOT NULL,
+    model VARCHAR(100) NOT NULL,
+    summary TEXT NOT NULL,
+    source_word_count INTEGER,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (file_id, max_length, model)
+);
+
 -- Create indexes for better performance
 CREATE INDEX IF NOT EXISTS idx_users_username ON users(username);
 CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
@@ -70,6 +90,18 @@ CREATE INDEX IF NOT EXISTS idx_quiz_sessions_created_at ON quiz_sessions(created
 ALTER TABLE users ADD COLUMN IF NOT EXISTS is_verified BOOLEAN NOT NULL DEFAULT FALSE;
 ALTER TABLE users ADD COLUMN IF NOT EXISTS verification_token VARCHAR(255);
 ALTER TABLE users ADD COLUMN IF NOT EXISTS verification_sent_at TIMESTAMP;
+-- Ingestion columns on pdf_files
+ALTER TABLE pdf_files ADD COLUMN IF NOT EXISTS ingest_status VARCHAR(20) NOT NULL DEFAULT 'pending';
+ALTER TABLE pdf_files ADD COLUMN IF NOT EXISTS ingest_error TEXT;
+ALTER TABLE pdf_files ADD COLUMN IF NOT EXISTS ingested_at TIMESTAMP;
+ALTER TABLE pdf_files ADD COLUMN IF NOT EXISTS page_count INTEGER;
+ALTER TABLE pdf_files ADD COLUMN IF NOT EXISTS word_count INTEGER;
+ALTER TABLE pdf_files ADD COLUMN IF NOT EXISTS content_sha256 CHAR(64);
+ALTER TABLE pdf_files ADD COLUMN IF NOT EXISTS size_bytes BIGINT;
+-- Summary details, computed when a summary is saved
+ALTER TABLE pdf_files ADD COLUMN IF NOT EXISTS summary_key_points JSONB;
+ALTER TABLE pdf_files ADD COLUMN IF NOT EXISTS summary_word_count INTEGER;
+CREATE INDEX IF NOT EXISTS idx_pdf_files_user_summary ON pdf_files(user_id, summary_generated_at DESC) WHERE summary IS NOT NULL;
 -- Password reset columns
 ALTER TABLE users ADD COLUMN IF NOT EXISTS reset_token VARCHAR(255);
 ALTER TABLE users ADD COLUMN IF NOT EXISTS reset_sent_at TIMESTAMP;
@@ -88,6 +120,95 @@ CREATE INDEX IF NOT EXISTS idx_user_sessions_user ON user_sessions(user_id);
 CREATE INDEX IF NOT EXISTS idx_user_sessions_started ON user_sessions(started_at);
 CREATE INDEX IF NOT EXISTS idx_user_sessions_ended ON user_sessions(ended_at);
 
+-- Queue of AI jobs (summaries, quizzes) processed by worker.py
+CREATE TABLE IF NOT EXISTS ai_jobs (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER REFERENCES users(user_id) ON DELETE CASCADE,
+    kind VARCHAR(50) NOT NULL,
+    payload JSONB NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued', -- queued, running, succeeded, failed
+    progress INTEGER NOT NULL DEFAULT 0,
+    result JSONB,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    locked_by VARCHAR(100),
+    locked_at TIMESTAMP, -- refreshed by the worker as a heartbeat
+    run_after TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_ai_jobs_queued ON ai_jobs(run_after, id) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_ai_jobs_running ON ai_jobs(locked_at) WHERE status = 'running';
+CREATE INDEX IF NOT EXISTS idx_ai_jobs_user ON ai_jobs(user_id);
+
+-- Generated quiz questions per file and difficulty, reused by later quizzes
+CREATE TABLE IF NOT EXISTS question_bank (
+    id SERIAL PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES pdf_files(id) ON DELETE CASCADE,
+    difficulty VARCHAR(10) NOT NULL,
+    question_key TEXT NOT NULL, -- normalized question text, for deduplication
+    question JSONB NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (file_id, difficulty, question_key)
+);
+
+-- PDFs stored once per content hash (uploads/blobs/), shared by pdf_files rows
+CREATE TABLE IF NOT EXISTS pdf_blobs (
+    content_sha256 CHAR(64) PRIMARY KEY,
+    file_path VARCHAR(500) NOT NULL,
+    size_bytes BIGINT NOT NULL,
+    ref_count INTEGER NOT NULL DEFAULT 0, -- pdf_files rows with this hash, kept by pdf_files_blob_refs
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_referenced_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_pdf_files_content_sha256 ON pdf_files(content_sha256);
+
+CREATE OR REPLACE FUNCTION pdf_blobs_track_refs() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.content_sha256 IS NOT DISTINCT FROM NEW.content_sha256 THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.content_sha256 IS NOT NULL THEN
+        UPDATE pdf_blobs
+        SET ref_count = ref_count - 1, last_referenced_at = NOW()
+        WHERE content_sha256 = OLD.content_sha256;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.content_sha256 IS NOT NULL THEN
+        UPDATE pdf_blobs
+        SET ref_count = ref_count + 1, last_referenced_at = NOW()
+        WHERE content_sha256 = NEW.content_sha256;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'pdf_files_blob_refs') THEN
+        CREATE TRIGGER pdf_files_blob_refs
+        AFTER INSERT OR DELETE OR UPDATE OF content_sha256 ON pdf_files
+        FOR EACH ROW EXECUTE FUNCTION pdf_blobs_track_refs();
+    END IF;
+END
+$$;
+
+-- Resumable uploads in progress; partial files live in uploads/sessions/
+CREATE TABLE IF NOT EXISTS upload_sessions (
+    id CHAR(32) PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    name VARCHAR(255) NOT NULL,
+    total_bytes BIGINT NOT NULL,
+    received_bytes BIGINT NOT NULL DEFAULT 0,
+    staging_path VARCHAR(500) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'open', -- open, finalizing, finalized
+    file_id INTEGER REFERENCES pdf_files(id) ON DELETE SET NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_upload_sessions_updated ON upload_sessions(updated_at);
+
 -- Insert a test user (password is 'testpassword123')
 -- You can use this to test the login functionality
 INSERT INTO users (username, password_hash, email, first_name, last_name) 
@@ -1,141 +1,393 @@
 import os
-import PyPDF2
-from openai import OpenAI
-from typing import Optional
+import re
+import json
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Optional
 import logging
 
+from context_packing import (
+    ANSWER_MAX_TOKENS, CHAT_CONTEXT_TOKENS, QUIZ_CONTEXT_TOKENS, estimate_tokens,
+    fit_text, pack_passages, prompt_budget, quiz_max_tokens, summary_max_tokens,
+)
+from doc_cache import DocumentCache, file_sha256
+from extraction_pool import extraction_pool
+from llm_client import OPENAI_MODEL, chat_completion, stream_chat_completion
+from pdf_text import PageRange, count_pdf_pages, extract_text_from_pdf
+from quiz_parser import QuizStreamParser, normalize_question, parse_quiz_questions
+from rate_limit import RateLimitExceeded
+from retrieval import INDEX_VERSION, RETRIEVAL_CHUNK_CHARS, BM25Index, build_index_bytes
+from singleflight import SingleFlight
+from summary_pipeline import combine_messages, condensed_section_summaries, needs_map_reduce
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Bump whenever extract_text_from_pdf changes its output so stale cache entries
+# are no longer read.
+EXTRACTOR_VERSION = "pypdf2-2"
+
+text_cache = DocumentCache(
+    "text", int(os.getenv("TEXT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+)
+retrieval_cache = DocumentCache(
+    "retrieval", int(os.getenv("RETRIEVAL_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+)
+
+# Quiz prompts only use the start of the document, so extraction stops here;
+# at most 4 characters per token, the prompt is trimmed to its budget later
+QUIZ_MAX_CHARS = QUIZ_CONTEXT_TOKENS * 4
+# Extra requests a streamed quiz makes for questions that came back broken
+QUIZ_STREAM_RETRIES = 2
+# Identical summaries requested at the same time (e.g. a whole class opening
+# one shared PDF) are extracted and generated once
+summary_flights = SingleFlight()
+# Most questions generated from one file in one request
+QUIZ_MAX_QUESTIONS_PER_FILE = 20
+# Files of a batch quiz generated at the same time
+BATCH_QUIZ_CONCURRENCY = int(os.getenv("BATCH_QUIZ_CONCURRENCY", "4"))
 
-def extract_text_from_pdf(file_path: str) -> str:
+async def document_key(file_path: str, pages: Optional[PageRange] = None) -> str:
     """
-    Extract text from a PDF file using PyPDF2.
+    Key for artifacts derived from a PDF: its SHA-256 plus EXTRACTOR_VERSION,
+    and the page range when only part of the document is used.
+    """
+    sha256 = await asyncio.to_thread(file_sha256, file_path)
+    key = f"{sha256}-{EXTRACTOR_VERSION}"
+    if pages:
+        key += f"-p{pages[0]}-{pages[1] or 'end'}"
+    return key
+
+async def load_pdf_text(
+    file_path: str,
+    pages: Optional[PageRange] = None,
+    max_chars: Optional[int] = None,
+) -> str:
+    """
+    Return the extracted text of a PDF, parsing it only on a cache miss.
+    
+    The cache is keyed by the SHA-256 of the file and EXTRACTOR_VERSION, so the
+    same bytes uploaded twice share one entry. Parsing runs in the extraction
+    process pool and file I/O in a thread, so the event loop is never blocked.
     
     Args:
         file_path (str): Path to the PDF file
+        pages (tuple): Optional (first_page, last_page); only those pages are parsed
+        max_chars (int): Callers that only need the start of the text can set
+            this so that, on a cache miss, parsing stops after enough pages
         
     Returns:
         str: Extracted text from the PDF
     """
+    cache_key = await document_key(file_path, pages)
+    text = await asyncio.to_thread(text_cache.get_text, cache_key)
+    if text is not None:
+        return text
+    
+    if max_chars is not None:
+        cache_key += f"-first{max_chars}"
+        text = await asyncio.to_thread(text_cache.get_text, cache_key)
+        if text is not None:
+            return text
+    
+    text = await extraction_pool.run(extract_text_from_pdf, file_path, pages, max_chars)
     try:
-        text = ""
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            
-            # Extract text from all pages
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                text += page.extract_text() + "\n"
+        await asyncio.to_thread(text_cache.put_text, cache_key, text)
+    except OSError as e:
+        logger.warning(f"Could not cache extracted text for {file_path}: {str(e)}")
+    return text
+
+async def load_retrieval_index(
+    file_path: str,
+    text: Optional[str] = None,
+    pages: Optional[PageRange] = None,
+) -> BM25Index:
+    """
+    Return the BM25 passage index of a PDF, building and storing it on first use.
+    
+    Args:
+        file_path (str): Path to the PDF file
+        text (str): Already extracted text of the file, if the caller has it
+        pages (tuple): Optional page range the index should cover
         
-        return text.strip()
+    Returns:
+        BM25Index: Index whose spans point into the extracted text
+    """
+    key = f"{await document_key(file_path, pages)}-{INDEX_VERSION}-{RETRIEVAL_CHUNK_CHARS}"
+    data = await asyncio.to_thread(retrieval_cache.get_bytes, key)
+    if data is None:
+        if text is None:
+            text = await load_pdf_text(file_path, pages)
+        data = await extraction_pool.run(build_index_bytes, text)
+        try:
+            await asyncio.to_thread(retrieval_cache.put_bytes, key, data)
+        except OSError as e:
+            logger.warning(f"Could not cache retrieval index for {file_path}: {str(e)}")
+    return BM25Index.from_bytes(data)
+
+async def validate_page_range(file_path: str, pages: Optional[PageRange], page_count: Optional[int] = None) -> None:
+    """
+    Raise ValueError if pages starts after the document's last page. The
+    page count is read from the PDF unless the caller already knows it.
+    """
+    if pages is None:
+        return
+    if page_count is None:
+        page_count = await extraction_pool.run(count_pdf_pages, file_path)
+    if pages[0] > page_count:
+        raise ValueError(f"Page range starts at page {pages[0]}, but the document has only {page_count} pages")
+
+async def ingest_pdf(file_path: str) -> dict:
+    """
+    Precompute everything the AI features derive from a PDF's bytes: the
+    extracted text and the retrieval index are stored in the document cache,
+    so the first summary or chat request does not have to parse the file.
     
-    except Exception as e:
-        logger.error(f"Error extracting text from PDF {file_path}: {str(e)}")
-        raise Exception(f"Failed to extract text from PDF: {str(e)}")
+    Args:
+        file_path (str): Path to the PDF file
+        
+    Returns:
+        dict: Contains 'content_sha256', 'page_count' and 'word_count'
+    """
+    text = await load_pdf_text(file_path)
+    page_count = await extraction_pool.run(count_pdf_pages, file_path)
+    if estimate_tokens(text, OPENAI_MODEL) > CHAT_CONTEXT_TOKENS:
+        await load_retrieval_index(file_path, text)
+    return {
+        "content_sha256": await asyncio.to_thread(file_sha256, file_path),
+        "page_count": page_count,
+        "word_count": len(text.split()),
+    }
+
+async def _summary_messages(text: str, max_length: int, cache_key: Optional[str] = None) -> list:
+    """
+    Build the chat messages for summarizing text in about max_length words.
+    
+    Short documents are sent whole. Longer ones go through the map-reduce
+    pipeline first and only the condensed section notes are sent.
+    """
+    if needs_map_reduce(text):
+        notes = await condensed_section_summaries(text, cache_key)
+        return combine_messages(notes, max_length)
+    
+    prompt = f"""
+    Please provide a comprehensive summary of the following document. 
+    The summary should be approximately {max_length} words and should capture the main points, key concepts, and important details.
+    
+    Document text:
+    {text}
+    
+    Summary:
+    """
+    
+    return [
+        {"role": "system", "content": "You are a helpful assistant that creates concise and informative summaries of academic and professional documents."},
+        {"role": "user", "content": prompt}
+    ]
 
-async def generate_summary(text: str, max_length: int = 500) -> str:
+async def generate_summary(
+    text: str,
+    max_length: int = 500,
+    cache_key: Optional[str] = None,
+    use_cache: bool = True,
+) -> str:
     """
     Generate a summary of the given text using OpenAI's GPT model.
     
     Args:
         text (str): The text to summarize
         max_length (int): Maximum length of the summary in words
+        cache_key (str): Document key under which intermediate section
+            summaries of long texts are cached (see document_key)
+        use_cache (bool): False bypasses the LLM response cache
         
     Returns:
         str: Generated summary
     """
     try:
-        # Truncate text if it's too long (OpenAI has token limits)
-        max_chars = 12000  # Roughly 3000 tokens
-        if len(text) > max_chars:
-            text = text[:max_chars] + "..."
-            logger.info(f"Text truncated to {max_chars} characters due to length")
-        
-        prompt = f"""
-        Please provide a comprehensive summary of the following document. 
-        The summary should be approximately {max_length} words and should capture the main points, key concepts, and important details.
-        
-        Document text:
-        {text}
-        
-        Summary:
-        """
-        
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that creates concise and informative summaries of academic and professional documents."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=800,
-            temperature=0.3
+        summary = await chat_completion(
+            messages=await _summary_messages(text, max_length, cache_key),
+            max_tokens=summary_max_tokens(max_length),
+            temperature=0.3,
+            use_cache=use_cache
         )
-        
-        summary = response.choices[0].message.content.strip()
-        return summary
+        return summary.strip()
     
+    except RateLimitExceeded:
+        raise
     except Exception as e:
         logger.error(f"Error generating summary: {str(e)}")
         raise Exception(f"Failed to generate summary: {str(e)}")
 
-async def answer_question_about_pdf(file_path: str, question: str) -> str:
+async def stream_summary(
+    text: str,
+    max_length: int = 500,
+    cache_key: Optional[str] = None,
+    use_cache: bool = True,
+) -> AsyncIterator[str]:
+    """
+    Prepare the summary prompt and start streaming the summary. Closing the
+    returned iterator early cancels the upstream request.
+    
+    Args:
+        text (str): The text to summarize
+        max_length (int): Maximum length of the summary in words
+        cache_key (str): Document key for cached section summaries
+        use_cache (bool): False bypasses the LLM response cache
+        
+    Returns:
+        AsyncIterator[str]: Fragments of the summary
+    """
+    messages = await _summary_messages(text, max_length, cache_key)
+    return stream_chat_completion(messages=messages, max_tokens=summary_max_tokens(max_length), temperature=0.3, use_cache=use_cache)
+
+async def _answer_messages(file_path: str, question: str, pages: Optional[PageRange] = None) -> list:
+    """Build the chat messages for answering a question about a PDF."""
+    # Extract text from PDF
+    extracted_text = await load_pdf_text(file_path, pages)
+    
+    if not extracted_text.strip():
+        raise Exception("No text could be extracted from the PDF")
+    
+    # Long documents: send only the passages most relevant to the question,
+    # as many as fit in the prompt budget
+    budget = prompt_budget(OPENAI_MODEL, CHAT_CONTEXT_TOKENS, ANSWER_MAX_TOKENS) - estimate_tokens(question, OPENAI_MODEL)
+    if estimate_tokens(extracted_text, OPENAI_MODEL) > budget:
+        index = await load_retrieval_index(file_path, extracted_text, pages)
+        passages = index.passages(extracted_text, index.search(question))
+        extracted_text = pack_passages(passages, budget, OPENAI_MODEL)
+        logger.info(f"Answering from {len(passages)} retrieved passages ({len(extracted_text)} characters)")
+    
+    prompt = f"""
+    Based on the following document content, please answer the user's question accurately and comprehensively. 
+    If the answer cannot be found in the document, please say so clearly.
+    
+    Document content:
+    {extracted_text}
+    
+    User's question: {question}
+    
+    Answer:
+    """
+    
+    return [
+        {"role": "system", "content": "You are a helpful assistant that answers questions based on document content. Always base your answers on the provided document and be clear when information is not available in the document."},
+        {"role": "user", "content": prompt}
+    ]
+
+async def answer_question_about_pdf(
+    file_path: str,
+    question: str,
+    pages: Optional[PageRange] = None,
+    use_cache: bool = True,
+) -> str:
     """
     Answer a question about the content of a PDF file using OpenAI's GPT model.
     
     Args:
         file_path (str): Path to the PDF file
         question (str): The question to answer
+        pages (tuple): Optional (first_page, last_page) to restrict the answer to
+        use_cache (bool): False bypasses the LLM response cache
         
     Returns:
         str: Generated answer based on the PDF content
     """
     try:
-        # Extract text from PDF
-        extracted_text = extract_text_from_pdf(file_path)
-        
-        if not extracted_text.strip():
-            raise Exception("No text could be extracted from the PDF")
-        
-        # Truncate text if it's too long (OpenAI has token limits)
-        max_chars = 10000  # Leave room for question and response
-        if len(extracted_text) > max_chars:
-            extracted_text = extracted_text[:max_chars] + "..."
-            logger.info(f"Text truncated to {max_chars} characters due to length")
-        
-        prompt = f"""
-        Based on the following document content, please answer the user's question accurately and comprehensively. 
-        If the answer cannot be found in the document, please say so clearly.
-        
-        Document content:
-        {extracted_text}
-        
-        User's question: {question}
-        
-        Answer:
-        """
-        
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that answers questions based on document content. Always base your answers on the provided document and be clear when information is not available in the document."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=500,
-            temperature=0.3
+        answer = await chat_completion(
+            messages=await _answer_messages(file_path, question, pages),
+            max_tokens=ANSWER_MAX_TOKENS,
+            temperature=0.3,
+            use_cache=use_cache
         )
-        
-        answer = response.choices[0].message.content.strip()
-        return answer
+        return answer.strip()
     
+    except RateLimitExceeded:
+        raise
     except Exception as e:
         logger.error(f"Error answering question about PDF: {str(e)}")
         raise Exception(f"Failed to answer question: {str(e)}")
 
-async def generate_quiz(text: str, num_questions: int = 5, difficulty: str = "medium") -> dict:
+async def stream_answer_about_pdf(
+    file_path: str,
+    question: str,
+    pages: Optional[PageRange] = None,
+    use_cache: bool = True,
+) -> AsyncIterator[str]:
+    """
+    Prepare the prompt for a question about a PDF and start streaming the answer.
+    
+    The caller must `aclose()` the returned iterator if it stops reading early,
+    which cancels the upstream request.
+    
+    Args:
+        file_path (str): Path to the PDF file
+        question (str): The question to answer
+        pages (tuple): Optional (first_page, last_page) to restrict the answer to
+        use_cache (bool): False bypasses the LLM response cache
+        
+    Returns:
+        AsyncIterator[str]: Fragments of the answer as the model produces them
+    """
+    messages = await _answer_messages(file_path, question, pages)
+    return stream_chat_completion(messages=messages, max_tokens=ANSWER_MAX_TOKENS, temperature=0.3, use_cache=use_cache)
+
+def _quiz_messages(text: str, num_questions: int, difficulty: str, avoid: Optional[list] = None) -> list:
+    """
+    Build the chat messages for a quiz of num_questions questions. `avoid`
+    lists questions already asked, which the model is told not to repeat.
+    """
+    # Truncate text to the prompt budget, leaving room for the quiz itself
+    text = fit_text(text, prompt_budget(OPENAI_MODEL, QUIZ_CONTEXT_TOKENS, quiz_max_tokens(num_questions)), OPENAI_MODEL)
+    avoid_text = ""
+    if avoid:
+        avoid_text = "- Do not repeat any of these existing questions:\n" + "\n".join(f"  * {q}" for q in avoid)
+    
+    prompt = f"""
+    Based on the following document content, create a quiz with {num_questions} multiple-choice questions at {difficulty} difficulty level.
+    
+    Requirements:
+    - Each question should have 4 options (A, B, C, D)
+    - Only one option should be correct
+    - Questions should test understanding of key concepts, facts, and details from the document
+    - Provide clear explanations for the correct answers
+    - Format the response as valid JSON
+    {avoid_text}
+    
+    Document content:
+    {text}
+    
+    Please format your response as a JSON object with this structure:
+    {{
+        "quiz_title": "Quiz based on document content",
+        "questions": [
+            {{
+                "question": "Question text here?",
+                "options": {{
+                    "A": "Option A text",
+                    "B": "Option B text", 
+                    "C": "Option C text",
+                    "D": "Option D text"
+                }},
+                "correct_answer": "A",
+                "explanation": "Explanation of why this answer is correct"
+            }}
+        ]
+    }}
+    """
+    
+    return [
+        {"role": "system", "content": "You are an expert educator that creates high-quality quiz questions based on document content. Always respond with valid JSON format."},
+        {"role": "user", "content": prompt}
+    ]
+
+async def generate_quiz(
+    text: str,
+    num_questions: int = 5,
+    difficulty: str = "medium",
+    use_cache: bool = True,
+    avoid: Optional[list] = None,
+) -> dict:
     """
     Generate a quiz based on the given text using OpenAI's GPT model.
     
@@ -143,81 +395,108 @@ async def generate_quiz(text: str, num_questions: int = 5, difficulty: str = "me
         text (str): The text to generate quiz questions from
         num_questions (int): Number of questions to generate
         difficulty (str): Difficulty level (easy, medium, hard)
+        use_cache (bool): False bypasses the LLM response cache
+        avoid (list): Texts of existing questions the quiz must not repeat
         
     Returns:
         dict: Contains quiz questions with multiple choice answers
     """
     try:
-        # Truncate text if it's too long (OpenAI has token limits)
-        max_chars = 10000  # Leave room for quiz generation
-        if len(text) > max_chars:
-            text = text[:max_chars] + "..."
-            logger.info(f"Text truncated to {max_chars} characters due to length")
-        
-        prompt = f"""
-        Based on the following document content, create a quiz with {num_questions} multiple-choice questions at {difficulty} difficulty level.
-        
-        Requirements:
-        - Each question should have 4 options (A, B, C, D)
-        - Only one option should be correct
-        - Questions should test understanding of key concepts, facts, and details from the document
-        - Provide clear explanations for the correct answers
-        - Format the response as valid JSON
-        
-        Document content:
-        {text}
-        
-        Please format your response as a JSON object with this structure:
-        {{
-            "quiz_title": "Quiz based on document content",
-            "questions": [
-                {{
-                    "question": "Question text here?",
-                    "options": {{
-                        "A": "Option A text",
-                        "B": "Option B text", 
-                        "C": "Option C text",
-                        "D": "Option D text"
-                    }},
-                    "correct_answer": "A",
-                    "explanation": "Explanation of why this answer is correct"
-                }}
-            ]
-        }}
-        """
-        
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are an expert educator that creates high-quality quiz questions based on document content. Always respond with valid JSON format."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=1500,
-            temperature=0.3
+        quiz_content = await chat_completion(
+            messages=_quiz_messages(text, num_questions, difficulty, avoid),
+            max_tokens=quiz_max_tokens(num_questions),
+            temperature=0.3,
+            use_cache=use_cache
         )
-        
-        quiz_content = response.choices[0].message.content.strip()
+        quiz_content = quiz_content.strip()
         
         # Try to parse the JSON response
-        import json
         try:
             quiz_data = json.loads(quiz_content)
             return quiz_data
         except json.JSONDecodeError:
-            # If JSON parsing fails, try to extract and fix the JSON
-            import re
-            json_match = re.search(r'\{.*\}', quiz_content, re.DOTALL)
-            if json_match:
-                quiz_data = json.loads(json_match.group())
-                return quiz_data
-            else:
+            # Keep every question that did parse instead of losing the whole quiz
+            questions, broken = parse_quiz_questions(quiz_content)
+            if not questions:
                 raise Exception("Failed to parse quiz response as JSON")
+            logger.warning(f"Quiz response was not valid JSON; kept {len(questions)} questions, dropped {broken}")
+            return {"quiz_title": "Quiz based on document content", "questions": questions}
     
+    except RateLimitExceeded:
+        raise
     except Exception as e:
         logger.error(f"Error generating quiz: {str(e)}")
         raise Exception(f"Failed to generate quiz: {str(e)}")
 
-async def generate_quiz_from_pdf(file_path: str, num_questions: int = 5, difficulty: str = "medium") -> dict:
+async def stream_quiz(
+    text: str,
+    num_questions: int = 5,
+    difficulty: str = "medium",
+    use_cache: bool = True,
+    avoid: Optional[list] = None,
+) -> AsyncIterator[dict]:
+    """
+    Generate a quiz as a stream of validated questions.
+    
+    The model's JSON is parsed incrementally and each question is yielded as
+    soon as its object closes and passes validation. Malformed, invalid or
+    duplicate questions are dropped, and only the number still missing is
+    requested again (at most QUIZ_STREAM_RETRIES more times). Closing the
+    iterator early cancels the upstream request.
+    
+    Args:
+        text (str): The text to generate quiz questions from
+        num_questions (int): Number of questions to generate
+        difficulty (str): Difficulty level (easy, medium, hard)
+        use_cache (bool): False bypasses the LLM response cache
+        avoid (list): Texts of existing questions the quiz must not repeat
+        
+    Returns:
+        AsyncIterator[dict]: Questions in the standard quiz format
+    """
+    avoid = list(avoid or [])
+    asked = []
+    seen = {question_key({"question": q}) for q in avoid}
+    for attempt in range(QUIZ_STREAM_RETRIES + 1):
+        missing = num_questions - len(asked)
+        parser = QuizStreamParser()
+        dropped = 0
+        tokens = stream_chat_completion(
+            messages=_quiz_messages(text, missing, difficulty, avoid=avoid + [q["question"] for q in asked]),
+            max_tokens=quiz_max_tokens(missing),
+            temperature=0.3,
+            use_cache=use_cache,
+        )
+        try:
+            async for token in tokens:
+                for item in parser.feed(token):
+                    question = normalize_question(item)
+                    key = question_key(question) if question else ""
+                    if not key or key in seen:
+                        dropped += 1
+                        continue
+                    seen.add(key)
+                    asked.append(question)
+                    yield question
+                    if len(asked) == num_questions:
+                        return
+        finally:
+            await tokens.aclose()
+        logger.warning(
+            f"Quiz stream attempt {attempt + 1} returned {num_questions - len(asked)} questions short "
+            f"({parser.broken} malformed, {dropped} invalid or duplicate)"
+        )
+    if not asked:
+        raise Exception("Failed to generate quiz: no valid questions in the response")
+
+async def generate_quiz_from_pdf(
+    file_path: str,
+    num_questions: int = 5,
+    difficulty: str = "medium",
+    pages: Optional[PageRange] = None,
+    use_cache: bool = True,
+    avoid: Optional[list] = None,
+) -> dict:
     """
     Extract text from a PDF and generate a quiz based on its content.
     
@@ -225,19 +504,22 @@ async def generate_quiz_from_pdf(file_path: str, num_questions: int = 5, difficu
         file_path (str): Path to the PDF file
         num_questions (int): Number of questions to generate
         difficulty (str): Difficulty level (easy, medium, hard)
+        pages (tuple): Optional (first_page, last_page) to draw questions from
+        use_cache (bool): False bypasses the LLM response cache
+        avoid (list): Texts of existing questions the quiz must not repeat
         
     Returns:
         dict: Contains quiz data and metadata
     """
     try:
-        # Extract text from PDF
-        extracted_text = extract_text_from_pdf(file_path)
+        # Extract text from PDF; the quiz prompt only needs the first pages
+        extracted_text = await load_pdf_text(file_path, pages, max_chars=QUIZ_MAX_CHARS)
         
         if not extracted_text.strip():
             raise Exception("No text could be extracted from the PDF")
         
         # Generate quiz
-        quiz_data = await generate_quiz(extracted_text, num_questions, difficulty)
+        quiz_data = await generate_quiz(extracted_text, num_questions, difficulty, use_cache, avoid)
         
         # Add metadata
         result = {
@@ -249,30 +531,147 @@ async def generate_quiz_from_pdf(file_path: str, num_questions: int = 5, difficu
         
         return result
     
+    except RateLimitExceeded:
+        raise
     except Exception as e:
         logger.error(f"Error in generate_quiz_from_pdf: {str(e)}")
         raise Exception(f"Failed to generate quiz from PDF: {str(e)}")
 
-async def summarize_pdf(file_path: str, max_length: int = 500) -> dict:
+def question_key(question: dict) -> str:
+    """Normalize a question's text so near-identical questions compare equal."""
+    return re.sub(r"[^0-9a-z]+", " ", str(question.get("question", "")).lower()).strip()
+
+async def generate_batch_quiz(
+    files: list,
+    total_questions: int,
+    difficulty: str = "medium",
+    use_cache: bool = True,
+    quiz_source: Optional[Callable[..., Awaitable[dict]]] = None,
+) -> dict:
+    """
+    Generate one quiz from several PDFs.
+    
+    Questions are split evenly across the files, which are processed
+    concurrently (at most BATCH_QUIZ_CONCURRENCY at a time). Each file is asked
+    for one spare question so duplicates can be dropped without coming up
+    short. The merged quiz takes questions round-robin from the files.
+    
+    Args:
+        files (list): Dicts with 'id', 'name' and 'file_path'
+        total_questions (int): Number of questions in the merged quiz, at
+            most QUIZ_MAX_QUESTIONS_PER_FILE per file
+        difficulty (str): Difficulty level (easy, medium, hard)
+        use_cache (bool): False bypasses the LLM response cache
+        quiz_source: Optional coroutine function (file, num_questions,
+            difficulty, use_cache) returning a result shaped like
+            generate_quiz_from_pdf's; by default each PDF is quizzed directly
+        
+    Returns:
+        dict: Contains 'quiz' (questions tagged with source_file_id and
+            source_file_name) and per-file 'sources'
+    """
+    if total_questions > QUIZ_MAX_QUESTIONS_PER_FILE * len(files):
+        raise ValueError(f"At most {QUIZ_MAX_QUESTIONS_PER_FILE} questions per file can be generated")
+    base, extra = divmod(total_questions, len(files))
+    allocation = [base + (1 if i < extra else 0) for i in range(len(files))]
+    slots = asyncio.Semaphore(BATCH_QUIZ_CONCURRENCY)
+    
+    async def run(file: dict, wanted: int):
+        if wanted == 0:
+            return []
+        requested = min(QUIZ_MAX_QUESTIONS_PER_FILE, wanted + (1 if len(files) > 1 else 0))
+        async with slots:
+            if quiz_source is not None:
+                result = await quiz_source(file, requested, difficulty, use_cache)
+            else:
+                result = await generate_quiz_from_pdf(file["file_path"], requested, difficulty, use_cache=use_cache)
+        return result["quiz"].get("questions", [])
+    
+    results = await asyncio.gather(
+        *(run(f, n) for f, n in zip(files, allocation)), return_exceptions=True
+    )
+    
+    seen = set()
+    per_file = []
+    sources = []
+    for file, wanted, result in zip(files, allocation, results):
+        source = {"file_id": file["id"], "file_name": file["name"], "requested": wanted, "generated": 0, "used": 0, "error": None}
+        unique = []
+        if isinstance(result, Exception):
+            logger.error(f"Batch quiz: file {file['id']} failed: {str(result)}")
+            source["error"] = str(result)
+        else:
+            source["generated"] = len(result)
+            for question in result:
+                key = question_key(question)
+                if not key or key in seen:
+                    continue
+                seen.add(key)
+                unique.append({**question, "source_file_id": file["id"], "source_file_name": file["name"]})
+        per_file.append(unique)
+        sources.append(source)
+    
+    if not any(per_file):
+        rate_limited = [r for r in results if isinstance(r, RateLimitExceeded)]
+        if rate_limited:
+            raise rate_limited[0]
+        raise Exception("No questions could be generated from the selected files")
+    
+    questions = []
+    round_index = 0
+    while len(questions) < total_questions and any(round_index < len(q) for q in per_file):
+        for file_questions, source in zip(per_file, sources):
+            if round_index < len(file_questions) and len(questions) < total_questions:
+                questions.append(file_questions[round_index])
+                source["used"] += 1
+        round_index += 1
+    
+    return {
+        "quiz": {
+            "quiz_title": f"Revision quiz from {len(files)} documents",
+            "questions": questions
+        },
+        "sources": sources,
+        "num_questions": len(questions),
+        "difficulty": difficulty
+    }
+
+async def summarize_pdf(
+    file_path: str,
+    max_length: int = 500,
+    pages: Optional[PageRange] = None,
+    use_cache: bool = True,
+) -> dict:
     """
     Extract text from a PDF and generate a summary.
     
     Args:
         file_path (str): Path to the PDF file
         max_length (int): Maximum length of the summary in words
+        pages (tuple): Optional (first_page, last_page) to summarize
+        use_cache (bool): False bypasses the LLM response cache and does not
+            join an identical summary already being generated
         
     Returns:
         dict: Contains 'text', 'summary', and 'word_count'
     """
+    if use_cache:
+        key = f"{await document_key(file_path, pages)}-{max_length}-{OPENAI_MODEL}"
+        return await summary_flights.do(key, lambda: _summarize_pdf(file_path, max_length, pages, use_cache))
+    return await _summarize_pdf(file_path, max_length, pages, use_cache)
+
+async def _summarize_pdf(file_path: str, max_length: int, pages: Optional[PageRange], use_cache: bool) -> dict:
     try:
         # Extract text from PDF
-        extracted_text = extract_text_from_pdf(file_path)
+        extracted_text = await load_pdf_text(file_path, pages)
         
         if not extracted_text.strip():
             raise Exception("No text could be extracted from the PDF")
         
         # Generate summary
-        summary = await generate_summary(extracted_text, max_length)
+        summary = await generate_summary(
+            extracted_text, max_length, await document_key(file_path, pages), use_cache
+        )
         
         # Count words in original text
         word_count = len(extracted_text.split())
@@ -284,6 +683,8 @@ async def summarize_pdf(file_path: str, max_length: int = 500) -> dict:
             "summary_length": len(summary.split())
         }
     
+    except RateLimitExceeded:
+        raise
     except Exception as e:
         logger.error(f"Error in summarize_pdf: {str(e)}")
         raise Exception(f"Failed to summarize PDF: {str(e)}")
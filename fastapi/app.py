@@ -1,11 +1,21 @@
 # main.py
 import os
+import logging
 from urllib.parse import urlparse
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from database import connect_db, disconnect_db, ensure_reset_columns
+from database import (
+    connect_db, disconnect_db, ensure_reset_columns,
+    ensure_pdf_summaries_table, ensure_pdf_ingest_columns, ensure_summary_detail_columns,
+)
+from blob_store import ensure_pdf_blobs_table
+from extraction_pool import extraction_pool
+from jobs import ensure_ai_jobs_table
+from question_bank import ensure_question_bank_table
+from llm_client import close_client
+from upload_sessions import ensure_upload_sessions_table
+from upload_store import UploadSizeLimitMiddleware
 from routes.files import router as files_router
 from routes.users import router as users_router
 from routes.ai import router as ai_router
@@ -14,8 +24,13 @@ from routes.auth_google import router as google_auth_router
 from routes.auth_email import router as email_auth_router
 from routes.sessions import router as sessions_router
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI()
 
+# Added before CORS so its 413 responses still carry the CORS headers
+app.add_middleware(UploadSizeLimitMiddleware)
+
 # Configure CORS to allow cookie-based auth from the frontend origin
 frontend_url = os.getenv("FRONTEND_URL", "http://localhost:3000")
 parsed = urlparse(frontend_url)
@@ -31,20 +46,32 @@ app.add_middleware(
     allow_credentials=True,
 )
 
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
-
 @app.on_event("startup")
 async def startup():
     await connect_db()
-    # Ensure optional schema bits needed by features like password reset
-    try:
-        await ensure_reset_columns()
-    except Exception:
-        # Don't crash app if migration fails; log would show in server
-        pass
+    extraction_pool.start()
+    # Ensure optional schema bits needed by features like password reset.
+    # Each step is tried on its own so one failure does not skip the rest;
+    # don't crash the app if one fails, but log it
+    for ensure in (
+        ensure_reset_columns,
+        ensure_pdf_summaries_table,
+        ensure_pdf_ingest_columns,
+        ensure_pdf_blobs_table,
+        ensure_upload_sessions_table,
+        ensure_summary_detail_columns,
+        ensure_ai_jobs_table,
+        ensure_question_bank_table,
+    ):
+        try:
+            await ensure()
+        except Exception:
+            logger.exception(f"Schema setup step {ensure.__name__} failed")
 
 @app.on_event("shutdown")
 async def shutdown():
+    extraction_pool.shutdown()
+    await close_client()
     await disconnect_db()
 
 app.include_router(files_router, prefix="/api")
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for the AI endpoints.
+
+Run the API against fake_llm_server.py (see its docstring), upload a PDF or
+two, then:
+
+    python bench_ai.py --file-id 3 --file-id 7 --requests 200 --concurrency 20
+
+Each selected endpoint is driven with the given number of requests and
+concurrency, and throughput plus p50/p95/p99 latency are reported. Streaming
+endpoints also report time to the first event. The session cookie is minted
+locally, so run this with the same JWT_SECRET environment variable as the API.
+Use --max-p95-ms to exit non-zero when an endpoint gets slower than allowed.
+"""
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+from collections import Counter
+from typing import Dict, List, Optional
+
+import httpx
+
+from security import create_session_token
+
+QUESTIONS = [
+    "What is the main topic of this document?",
+    "Summarize the key findings.",
+    "What methods are described?",
+    "What are the limitations mentioned?",
+    "Which definitions are introduced?",
+]
+
+ENDPOINTS = {
+    "summarize": ("/ai/summarize", False),
+    "summarize-stream": ("/ai/summarize/stream", True),
+    "chat": ("/ai/chat", False),
+    "chat-stream": ("/ai/chat/stream", True),
+    "quiz": ("/ai/generate-quiz", False),
+    "quiz-stream": ("/ai/generate-quiz/stream", True),
+}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of values (which must not be empty)."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def form_for(endpoint: str, file_id: int, regenerate: bool, rng: random.Random) -> Dict[str, str]:
+    form = {"file_id": str(file_id), "regenerate": str(regenerate).lower()}
+    if endpoint.startswith("summarize"):
+        form["max_length"] = "300"
+    elif endpoint.startswith("chat"):
+        form["question"] = rng.choice(QUESTIONS)
+    else:
+        form["num_questions"] = "5"
+        form["difficulty"] = "medium"
+    return form
+
+
+async def one_request(client: httpx.AsyncClient, path: str, stream: bool, form: Dict[str, str]) -> dict:
+    started = time.perf_counter()
+    first_event = None
+    try:
+        if stream:
+            async with client.stream("POST", path, data=form) as response:
+                status = response.status_code
+                failed = status != 200
+                async for line in response.aiter_lines():
+                    if line.startswith("event:"):
+                        if first_event is None:
+                            first_event = time.perf_counter() - started
+                        if line.strip() == "event: error":
+                            failed = True
+        else:
+            response = await client.post(path, data=form)
+            status = response.status_code
+            failed = status != 200
+    except httpx.HTTPError as e:
+        status, failed = type(e).__name__, True
+    return {
+        "latency": time.perf_counter() - started,
+        "first_event": first_event,
+        "status": status,
+        "ok": not failed,
+    }
+
+
+async def run_endpoint(
+    client: httpx.AsyncClient,
+    endpoint: str,
+    file_ids: List[int],
+    total: int,
+    concurrency: int,
+    regenerate: bool,
+    seed: int,
+) -> dict:
+    path, stream = ENDPOINTS[endpoint]
+    rng = random.Random(seed)
+    forms = [form_for(endpoint, rng.choice(file_ids), regenerate, rng) for _ in range(total)]
+    slots = asyncio.Semaphore(concurrency)
+
+    async def run(form):
+        async with slots:
+            return await one_request(client, path, stream, form)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(run(f) for f in forms))
+    elapsed = time.perf_counter() - started
+
+    ok = [r for r in results if r["ok"]]
+    latencies = [r["latency"] * 1000 for r in ok]
+    report = {
+        "endpoint": endpoint,
+        "requests": total,
+        "concurrency": concurrency,
+        "ok": len(ok),
+        "errors": dict(Counter(str(r["status"]) for r in results if not r["ok"])),
+        "elapsed_seconds": round(elapsed, 2),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+    }
+    if latencies:
+        report.update({
+            "p50_ms": round(percentile(latencies, 50), 1),
+            "p95_ms": round(percentile(latencies, 95), 1),
+            "p99_ms": round(percentile(latencies, 99), 1),
+            "max_ms": round(max(latencies), 1),
+        })
+    first_events = [r["first_event"] * 1000 for r in ok if r["first_event"] is not None]
+    if first_events:
+        report.update({
+            "first_event_p50_ms": round(percentile(first_events, 50), 1),
+            "first_event_p95_ms": round(percentile(first_events, 95), 1),
+        })
+    return report
+
+
+def print_report(reports: List[dict]) -> None:
+    header = f"{'endpoint':<18}{'ok':>7}{'err':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ttfe p50':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in reports:
+        errors = sum(r["errors"].values())
+        print(
+            f"{r['endpoint']:<18}{r['ok']:>7}{errors:>6}{r['throughput_rps']:>9}"
+            f"{r.get('p50_ms', '-'):>10}{r.get('p95_ms', '-'):>10}{r.get('p99_ms', '-'):>10}"
+            f"{r.get('first_event_p50_ms', '-'):>10}"
+        )
+        if r["errors"]:
+            print(f"{'':<18}errors: {r['errors']}")
+
+
+async def main(args) -> int:
+    token = create_session_token({"user_id": args.user_id, "username": args.username, "email": args.email})
+    endpoints = args.endpoint or ["summarize", "chat", "quiz"]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(
+        base_url=args.api_url,
+        cookies={"sp_session": token},
+        timeout=httpx.Timeout(args.timeout),
+        limits=limits,
+    ) as client:
+        if args.warmup:
+            # One request per file and endpoint so extraction and indexing are not measured
+            await asyncio.gather(*(
+                run_endpoint(client, e, [f], 1, 1, False, args.seed) for e in endpoints for f in args.file_id
+            ))
+        reports = []
+        for endpoint in endpoints:
+            reports.append(await run_endpoint(
+                client, endpoint, args.file_id, args.requests, args.concurrency, args.regenerate, args.seed
+            ))
+        try:
+            stats = (await client.get("/ai/stats")).json()
+        except (httpx.HTTPError, ValueError):
+            stats = None
+
+    print_report(reports)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"reports": reports, "ai_stats": stats}, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+    if args.max_p95_ms is not None:
+        slow = [r["endpoint"] for r in reports if r.get("p95_ms", float("inf")) > args.max_p95_ms]
+        if slow:
+            print(f"\np95 above {args.max_p95_ms} ms: {', '.join(slow)}")
+            return 1
+    return 0
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api-url", default="http://localhost:8000/api")
+    parser.add_argument("--file-id", type=int, action="append", required=True,
+                        help="PDF to use; repeat to spread requests over several files")
+    parser.add_argument("--endpoint", action="append", choices=sorted(ENDPOINTS),
+                        help="Endpoint to drive; repeatable (default: summarize, chat, quiz)")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--regenerate", action="store_true",
+                        help="Send regenerate=true so stored summaries and response caches are bypassed")
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--user-id", type=int, default=1, help="User the session cookie is minted for")
+    parser.add_argument("--username", default="bench")
+    parser.add_argument("--email", default="bench@example.com")
+    parser.add_argument("--output", help="Write the reports and /ai/stats as JSON")
+    parser.add_argument("--max-p95-ms", type=float, help="Exit with status 1 if any endpoint's p95 is above this")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main(parse_args())))
@@ -0,0 +1,288 @@
+import os
+import shutil
+import asyncio
+import logging
+
+from fastapi import UploadFile
+
+from database import database
+from doc_cache import file_sha256, remember_sha256
+from upload_store import MAX_UPLOAD_BYTES, UPLOAD_DIR, hash_upload, new_upload_path, save_upload
+
+logger = logging.getLogger(__name__)
+
+# PDFs are stored once per content hash under uploads/blobs/<2 hex>/<sha256>.pdf
+BLOB_DIR = os.path.join(UPLOAD_DIR, "blobs")
+# A blob no pdf_files row points to is deleted after this long; the delay
+# covers uploads that registered the blob but have not inserted their row yet
+BLOB_GC_GRACE_SECONDS = int(os.getenv("BLOB_GC_GRACE_SECONDS", "3600"))
+
+
+def blob_path(content_sha256: str) -> str:
+    return os.path.join(BLOB_DIR, content_sha256[:2], f"{content_sha256}.pdf")
+
+
+async def ensure_pdf_blobs_table():
+    """
+    Ensure the pdf_blobs table exists, with a trigger on pdf_files that keeps
+    each blob's ref_count equal to the rows pointing at its content hash.
+    """
+    await database.execute(
+        """
+        CREATE TABLE IF NOT EXISTS pdf_blobs (
+            content_sha256 CHAR(64) PRIMARY KEY,
+            file_path VARCHAR(500) NOT NULL,
+            size_bytes BIGINT NOT NULL,
+            ref_count INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            last_referenced_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    # Finds the other rows (and their summaries, question banks) sharing a file
+    await database.execute("CREATE INDEX IF NOT EXISTS idx_pdf_files_content_sha256 ON pdf_files(content_sha256)")
+    await database.execute(
+        """
+        CREATE OR REPLACE FUNCTION pdf_blobs_track_refs() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE' AND OLD.content_sha256 IS NOT DISTINCT FROM NEW.content_sha256 THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.content_sha256 IS NOT NULL THEN
+                UPDATE pdf_blobs
+                SET ref_count = ref_count - 1, last_referenced_at = NOW()
+                WHERE content_sha256 = OLD.content_sha256;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.content_sha256 IS NOT NULL THEN
+                UPDATE pdf_blobs
+                SET ref_count = ref_count + 1, last_referenced_at = NOW()
+                WHERE content_sha256 = NEW.content_sha256;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    # CREATE TRIGGER has no IF NOT EXISTS before Postgres 14
+    await database.execute(
+        """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'pdf_files_blob_refs') THEN
+                CREATE TRIGGER pdf_files_blob_refs
+                AFTER INSERT OR DELETE OR UPDATE OF content_sha256 ON pdf_files
+                FOR EACH ROW EXECUTE FUNCTION pdf_blobs_track_refs();
+            END IF;
+        END
+        $$
+        """
+    )
+
+
+async def register_blob(content_sha256: str, file_path: str, size_bytes: int) -> bool:
+    """
+    Record a blob, or mark an existing one as just referenced so GC leaves it alone.
+    Returns True if the blob is new.
+
+    Call this before writing the file: if GC is removing the blob, this waits
+    for it to finish, and the caller then finds the file gone and rewrites it.
+    """
+    query = """
+    INSERT INTO pdf_blobs (content_sha256, file_path, size_bytes)
+    VALUES (:content_sha256, :file_path, :size_bytes)
+    ON CONFLICT (content_sha256) DO UPDATE SET last_referenced_at = NOW()
+    RETURNING (xmax = 0) AS inserted
+    """
+    values = {"content_sha256": content_sha256, "file_path": file_path, "size_bytes": size_bytes}
+    return bool(await database.fetch_val(query=query, values=values))
+
+
+def _place_blob(staging_path: str, path: str) -> bool:
+    """Move a staged upload to its blob path; returns True if the blob already existed."""
+    if os.path.exists(path):
+        os.remove(staging_path)
+        return True
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(staging_path, path)
+    return False
+
+
+def _stored_blob(content_sha256: str, size_bytes: int, path: str, deduplicated: bool) -> dict:
+    remember_sha256(path, content_sha256)
+    if deduplicated:
+        logger.info(f"Upload matches stored blob {content_sha256[:12]}, skipped writing {size_bytes} bytes")
+    return {
+        "content_sha256": content_sha256,
+        "size_bytes": size_bytes,
+        "file_path": path,
+        "deduplicated": deduplicated,
+    }
+
+
+async def store_staged_file(staging_path: str, content_sha256: str, size_bytes: int) -> dict:
+    """
+    Move a complete, hashed file into the blob store. If a blob with the same
+    hash is already stored, the staged copy is deleted instead.
+
+    Returns:
+        dict: Contains 'content_sha256', 'size_bytes', 'file_path' and
+        'deduplicated'
+    """
+    path = blob_path(content_sha256)
+    try:
+        await register_blob(content_sha256, path, size_bytes)
+        deduplicated = await asyncio.to_thread(_place_blob, staging_path, path)
+    except BaseException:
+        try:
+            await asyncio.to_thread(os.remove, staging_path)
+        except OSError:
+            pass
+        raise
+
+    return _stored_blob(content_sha256, size_bytes, path, deduplicated)
+
+
+async def store_upload(upload: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> dict:
+    """
+    Save an uploaded PDF in the blob store.
+
+    The upload is hashed where FastAPI spooled it (see hash_upload). Only if
+    no blob with that hash is stored yet is it copied to a staging file and
+    moved to the path for its content hash.
+
+    Args:
+        upload (UploadFile): The uploaded file
+        max_bytes (int): Size limit
+
+    Returns:
+        dict: Contains 'content_sha256', 'size_bytes', 'file_path' and
+        'deduplicated'
+
+    Raises:
+        UploadTooLarge: If the file is larger than max_bytes
+        NotAPdf: If the file does not have a PDF header
+    """
+    stored = await hash_upload(upload, max_bytes)
+    content_sha256, size_bytes = stored["content_sha256"], stored["size_bytes"]
+    path = blob_path(content_sha256)
+    new_blob = await register_blob(content_sha256, path, size_bytes)
+    # A blob registered by an upload that has not placed its file yet is
+    # written again; both copies are identical and land with os.replace
+    if not new_blob and await asyncio.to_thread(os.path.exists, path):
+        deduplicated = True
+    else:
+        staging_path = new_upload_path()
+        try:
+            await save_upload(upload, staging_path)
+            deduplicated = await asyncio.to_thread(_place_blob, staging_path, path)
+        except BaseException:
+            try:
+                await asyncio.to_thread(os.remove, staging_path)
+            except OSError:
+                pass
+            raise
+
+    return _stored_blob(content_sha256, size_bytes, path, deduplicated)
+
+
+async def collect_unreferenced_blobs(grace_seconds: int = BLOB_GC_GRACE_SECONDS) -> int:
+    """
+    Delete blobs no pdf_files row has referenced for grace_seconds. Returns how many were removed.
+
+    Each blob's row is deleted and its file unlinked in one transaction, so the
+    row stays locked until the file is gone. register_blob for the same hash
+    waits on that lock: it either refreshes the row first (and the DELETE skips
+    it), or inserts a new row after the file is gone and the caller writes the
+    file again.
+    """
+    candidates = await database.fetch_all(
+        query="""
+        SELECT content_sha256 FROM pdf_blobs
+        WHERE ref_count <= 0
+          AND last_referenced_at < NOW() - make_interval(secs => CAST(:grace AS DOUBLE PRECISION))
+        """,
+        values={"grace": grace_seconds},
+    )
+    removed = 0
+    for candidate in candidates:
+        async with database.transaction():
+            # Re-checked under the row lock: the blob may have been referenced since
+            file_path = await database.fetch_val(
+                query="""
+                DELETE FROM pdf_blobs
+                WHERE content_sha256 = :content_sha256
+                  AND ref_count <= 0
+                  AND last_referenced_at < NOW() - make_interval(secs => CAST(:grace AS DOUBLE PRECISION))
+                RETURNING file_path
+                """,
+                values={"content_sha256": candidate["content_sha256"], "grace": grace_seconds},
+            )
+            if file_path is None:
+                continue
+            try:
+                await asyncio.to_thread(os.remove, file_path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def _copy_to_blob(source_path: str, path: str) -> bool:
+    """Copy a file to its blob path; returns True if the blob already existed."""
+    if os.path.exists(path):
+        return True
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.part"
+    shutil.copy2(source_path, tmp_path)
+    os.replace(tmp_path, path)
+    return False
+
+
+async def migrate_legacy_uploads() -> dict:
+    """
+    Move files uploaded before the blob store into it, pointing their rows
+    at the shared blob and deleting the old copies. Safe to run repeatedly.
+
+    Returns:
+        dict: Contains 'migrated', 'missing' and 'bytes_freed'
+    """
+    rows = await database.fetch_all(
+        query="SELECT id, file_path FROM pdf_files WHERE file_path NOT LIKE :prefix ORDER BY id",
+        values={"prefix": f"{BLOB_DIR}{os.sep}%"},
+    )
+    migrated = missing = bytes_freed = 0
+    for row in rows:
+        old_path = row["file_path"]
+        if not os.path.exists(old_path):
+            missing += 1
+            continue
+        digest = await asyncio.to_thread(file_sha256, old_path)
+        size = os.path.getsize(old_path)
+        path = blob_path(digest)
+        # Copy first, repoint the row, then delete: a crash in between leaves
+        # an extra file, never a row pointing at nothing
+        await register_blob(digest, path, size)
+        duplicate = await asyncio.to_thread(_copy_to_blob, old_path, path)
+        await database.execute(
+            query="""
+            UPDATE pdf_files
+            SET file_path = :file_path, content_sha256 = :content_sha256, size_bytes = :size_bytes
+            WHERE id = :id
+            """,
+            values={"id": row["id"], "file_path": path, "content_sha256": digest, "size_bytes": size},
+        )
+        # Rows hashed by the ingest job before the blob existed were never counted
+        await database.execute(
+            query="""
+            UPDATE pdf_blobs
+            SET ref_count = (SELECT COUNT(*) FROM pdf_files WHERE content_sha256 = :content_sha256)
+            WHERE content_sha256 = :content_sha256
+            """,
+            values={"content_sha256": digest},
+        )
+        await asyncio.to_thread(os.remove, old_path)
+        migrated += 1
+        if duplicate:
+            bytes_freed += size
+    logger.info(f"Moved {migrated} uploads into the blob store ({missing} missing on disk)")
+    return {"migrated": migrated, "missing": missing, "bytes_freed": bytes_freed}
@@ -0,0 +1,127 @@
+import os
+import logging
+from typing import Any, Dict, List
+
+try:
+    import tiktoken
+except ImportError:  # optional; the heuristic below is used instead
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Context window per model family (prompt + completion), longest prefix wins
+MODEL_CONTEXT_TOKENS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4.1": 1047576,
+}
+DEFAULT_CONTEXT_TOKENS = int(os.getenv("CONTEXT_WINDOW_TOKENS", "16385"))
+
+# How much document content each kind of prompt may carry
+SUMMARY_CONTEXT_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "3000"))
+CHAT_CONTEXT_TOKENS = int(os.getenv("CHAT_CONTEXT_TOKENS", "2500"))
+QUIZ_CONTEXT_TOKENS = int(os.getenv("QUIZ_CONTEXT_TOKENS", "2500"))
+
+# Instructions, system message and chat framing around the document
+PROMPT_OVERHEAD_TOKENS = 300
+
+ANSWER_MAX_TOKENS = 500
+
+_encoders: Dict[str, Any] = {}
+
+
+def _encoder(model: str):
+    if tiktoken is None:
+        return None
+    if model not in _encoders:
+        try:
+            _encoders[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encoders[model] = tiktoken.get_encoding("cl100k_base")
+    return _encoders[model]
+
+
+def estimate_tokens(text: str, model: str) -> int:
+    """
+    Count the tokens text will use with model.
+
+    Uses tiktoken when it is installed. Otherwise roughly 4 ASCII characters
+    per token, and one token per non-ASCII character, which keeps Thai, CJK and
+    other non-Latin documents from being badly underestimated.
+    """
+    encoder = _encoder(model)
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def context_window(model: str) -> int:
+    matches = [name for name in MODEL_CONTEXT_TOKENS if model.startswith(name)]
+    if not matches:
+        return DEFAULT_CONTEXT_TOKENS
+    return MODEL_CONTEXT_TOKENS[max(matches, key=len)]
+
+
+def prompt_budget(model: str, wanted: int, max_tokens: int) -> int:
+    """Clip a content budget so content, framing and completion fit the window."""
+    return max(0, min(wanted, context_window(model) - max_tokens - PROMPT_OVERHEAD_TOKENS))
+
+
+def chars_for_tokens(text: str, tokens: int, model: str) -> int:
+    """Approximate number of characters of text that make up `tokens` tokens."""
+    if not text:
+        return tokens * 4
+    total = max(1, estimate_tokens(text, model))
+    return max(1, int(len(text) * tokens / total))
+
+
+def fit_text(text: str, budget_tokens: int, model: str) -> str:
+    """
+    Return the longest prefix of text that fits in budget_tokens, marked with
+    "..." when something was cut.
+    """
+    if estimate_tokens(text, model) <= budget_tokens:
+        return text
+    encoder = _encoder(model)
+    if encoder is not None:
+        tokens = encoder.encode(text, disallowed_special=())
+        return encoder.decode(tokens[:budget_tokens]) + "..."
+
+    cut = chars_for_tokens(text, budget_tokens, model)
+    while cut > 0 and estimate_tokens(text[:cut], model) > budget_tokens:
+        cut = int(cut * 0.9)
+    logger.info(f"Text truncated to {cut} characters to fit {budget_tokens} tokens")
+    return text[:cut] + "..."
+
+
+def pack_passages(passages: List[str], budget_tokens: int, model: str, separator: str = "\n\n[...]\n\n") -> str:
+    """
+    Join passages in order until the budget is used; the first passage that
+    does not fit is trimmed to the remaining space.
+    """
+    packed = []
+    used = 0
+    sep_tokens = estimate_tokens(separator, model)
+    for passage in passages:
+        cost = estimate_tokens(passage, model) + (sep_tokens if packed else 0)
+        if used + cost > budget_tokens:
+            remaining = budget_tokens - used - (sep_tokens if packed else 0)
+            if remaining > 50:
+                packed.append(fit_text(passage, remaining, model))
+            break
+        packed.append(passage)
+        used += cost
+    return separator.join(packed)
+
+
+def summary_max_tokens(max_length_words: int) -> int:
+    """Completion tokens for a summary of about max_length_words words."""
+    return min(4096, max(200, int(max_length_words * 1.4) + 100))
+
+
+def quiz_max_tokens(num_questions: int) -> int:
+    """Completion tokens for a JSON quiz with num_questions questions."""
+    return min(8192, 300 + 200 * num_questions)
@@ -1,4 +1,6 @@
-from typing import Optional
+import re
+import json
+from typing import List, Optional
 from databases import Database
 
 POSTGRES_USER = "temp"
@@ -147,18 +149,96 @@ async def update_user_password(user_id: int, password_hash: str):
     """
     return await database.fetch_one(query=query, values={"user_id": user_id, "password_hash": password_hash})
 
-async def insert_pdf(user_id: int, name: str, file_path: str):
+async def insert_pdf(
+    user_id: int,
+    name: str,
+    file_path: str,
+    content_sha256: Optional[str] = None,
+    size_bytes: Optional[int] = None,
+):
     query = """
-    INSERT INTO pdf_files (user_id, name, file_path)
-    VALUES (:user_id, :name, :file_path)
-    RETURNING id, user_id, name, file_path, uploaded_at
+    INSERT INTO pdf_files (user_id, name, file_path, content_sha256, size_bytes)
+    VALUES (:user_id, :name, :file_path, :content_sha256, :size_bytes)
+    RETURNING id, user_id, name, file_path, uploaded_at, content_sha256, size_bytes
     """
-    values = {"user_id": user_id, "name": name, "file_path": file_path}
+    values = {
+        "user_id": user_id,
+        "name": name,
+        "file_path": file_path,
+        "content_sha256": content_sha256,
+        "size_bytes": size_bytes,
+    }
     return await database.fetch_one(query=query, values=values)
 
+async def ensure_pdf_ingest_columns():
+    """Ensure pdf_files has the columns written at upload and by the ingestion job."""
+    await database.execute(
+        "ALTER TABLE pdf_files ADD COLUMN IF NOT EXISTS ingest_status VARCHAR(20) NOT NULL DEFAULT 'pending'"
+    )
+    await database.execute("ALTER TABLE pdf_files ADD COLUMN IF NOT EXISTS ingest_error TEXT")
+    await database.execute("ALTER TABLE pdf_files ADD COLUMN IF NOT EXISTS ingested_at TIMESTAMP")
+    await database.execute("ALTER TABLE pdf_files ADD COLUMN IF NOT EXISTS page_count INTEGER")
+    await database.execute("ALTER TABLE pdf_files ADD COLUMN IF NOT EXISTS word_count INTEGER")
+    await database.execute("ALTER TABLE pdf_files ADD COLUMN IF NOT EXISTS content_sha256 CHAR(64)")
+    await database.execute("ALTER TABLE pdf_files ADD COLUMN IF NOT EXISTS size_bytes BIGINT")
+
+async def set_pdf_ingest_status(file_id: int, status: str, error: Optional[str] = None):
+    query = """
+    UPDATE pdf_files
+    SET ingest_status = :status, ingest_error = :error
+    WHERE id = :file_id
+    """
+    await database.execute(query=query, values={"file_id": file_id, "status": status, "error": error})
+
+async def save_pdf_ingest_result(file_id: int, content_sha256: str, page_count: int, word_count: int):
+    query = """
+    UPDATE pdf_files
+    SET ingest_status = 'ready',
+        ingest_error = NULL,
+        ingested_at = NOW(),
+        content_sha256 = :content_sha256,
+        page_count = :page_count,
+        word_count = :word_count
+    WHERE id = :file_id
+    """
+    values = {
+        "file_id": file_id,
+        "content_sha256": content_sha256,
+        "page_count": page_count,
+        "word_count": word_count,
+    }
+    await database.execute(query=query, values=values)
+
+async def copy_ingest_result_from_twin(file_id: int, content_sha256: str):
+    """
+    Mark a file as ingested using another row with the same content that
+    already is, so its cached text and indexes are reused without a job.
+    Returns the updated row, or None if no such row exists.
+    """
+    query = """
+    UPDATE pdf_files
+    SET ingest_status = 'ready',
+        ingest_error = NULL,
+        ingested_at = NOW(),
+        page_count = twin.page_count,
+        word_count = twin.word_count
+    FROM (
+        SELECT page_count, word_count FROM pdf_files
+        WHERE content_sha256 = :content_sha256 AND ingest_status = 'ready' AND id <> :file_id
+        LIMIT 1
+    ) AS twin
+    WHERE pdf_files.id = :file_id
+    RETURNING pdf_files.id, pdf_files.page_count, pdf_files.word_count
+    """
+    return await database.fetch_one(query=query, values={"file_id": file_id, "content_sha256": content_sha256})
+
+async def get_pdf_file(file_id: int):
+    query = "SELECT * FROM pdf_files WHERE id = :file_id"
+    return await database.fetch_one(query=query, values={"file_id": file_id})
+
 async def get_recent_pdfs(user_id: int, limit: int = 10):
     query = """
-    SELECT id, name, file_path, uploaded_at
+    SELECT id, name, file_path, uploaded_at, ingest_status, page_count, word_count
     FROM pdf_files
     WHERE user_id = :user_id
     ORDER BY uploaded_at DESC
@@ -283,3 +363,148 @@ async def get_last_session_seconds(user_id: int) -> Optional[int]:
     LIMIT 1
     """
     return await database.fetch_val(query=query, values={"user_id": user_id})
+
+# --- Stored summaries --------------------------------------------------------
+
+async def ensure_pdf_summaries_table():
+    await database.execute(
+        """
+        CREATE TABLE IF NOT EXISTS pdf_summaries (
+            id SERIAL PRIMARY KEY,
+            file_id INTEGER NOT NULL REFERENCES pdf_files(id) ON DELETE CASCADE,
+            max_length INTEGER NOT NULL,
+            model VARCHAR(100) NOT NULL,
+            summary TEXT NOT NULL,
+            source_word_count INTEGER,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (file_id, max_length, model)
+        )
+        """
+    )
+
+# Ids of the file :file_id and every other row stored with the same content
+SAME_CONTENT_FILE_IDS = """
+SELECT twin.id
+FROM pdf_files f
+JOIN pdf_files twin ON twin.id = f.id OR twin.content_sha256 = f.content_sha256
+WHERE f.id = :file_id
+"""
+
+async def get_stored_summary(file_id: int, max_length: int, model: str):
+    """Find a stored summary of this file, or of any file with the same content."""
+    query = f"""
+    SELECT file_id, summary, source_word_count, created_at
+    FROM pdf_summaries
+    WHERE file_id IN ({SAME_CONTENT_FILE_IDS}) AND max_length = :max_length AND model = :model
+    ORDER BY file_id = :file_id DESC, created_at DESC
+    LIMIT 1
+    """
+    return await database.fetch_one(
+        query=query, values={"file_id": file_id, "max_length": max_length, "model": model}
+    )
+
+async def upsert_stored_summary(
+    file_id: int,
+    max_length: int,
+    model: str,
+    summary: str,
+    source_word_count: Optional[int] = None,
+):
+    query = """
+    INSERT INTO pdf_summaries (file_id, max_length, model, summary, source_word_count)
+    VALUES (:file_id, :max_length, :model, :summary, :source_word_count)
+    ON CONFLICT (file_id, max_length, model) DO UPDATE
+    SET summary = EXCLUDED.summary,
+        source_word_count = EXCLUDED.source_word_count,
+        created_at = CURRENT_TIMESTAMP
+    """
+    values = {
+        "file_id": file_id,
+        "max_length": max_length,
+        "model": model,
+        "summary": summary,
+        "source_word_count": source_word_count,
+    }
+    await database.execute(query=query, values=values)
+
+_KEY_POINT_SPLIT = re.compile(r'\n|\. ')
+_KEY_POINT_NUMBER = re.compile(r'^\d+\.\s*')
+
+def summary_key_points(summary: Optional[str], limit: int = 8) -> List[str]:
+    """Split a summary into up to `limit` key points (lines or sentences)."""
+    points = [p.strip() for p in _KEY_POINT_SPLIT.split(summary or "")]
+    return [_KEY_POINT_NUMBER.sub('', p) for p in points if len(p) > 10][:limit]
+
+async def ensure_summary_detail_columns():
+    """
+    Ensure pdf_files stores each summary's key points and word count, and
+    fill them in for summaries written before the columns existed.
+    """
+    await database.execute("ALTER TABLE pdf_files ADD COLUMN IF NOT EXISTS summary_key_points JSONB")
+    await database.execute("ALTER TABLE pdf_files ADD COLUMN IF NOT EXISTS summary_word_count INTEGER")
+    await database.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_pdf_files_user_summary
+        ON pdf_files(user_id, summary_generated_at DESC)
+        WHERE summary IS NOT NULL
+        """
+    )
+    while True:
+        rows = await database.fetch_all(
+            "SELECT id, summary FROM pdf_files WHERE summary IS NOT NULL AND summary_key_points IS NULL LIMIT 500"
+        )
+        if not rows:
+            break
+        await database.execute_many(
+            query="""
+            UPDATE pdf_files
+            SET summary_key_points = :key_points, summary_word_count = :word_count
+            WHERE id = :id
+            """,
+            values=[
+                {
+                    "id": row["id"],
+                    "key_points": json.dumps(summary_key_points(row["summary"])),
+                    "word_count": len(row["summary"].split()),
+                }
+                for row in rows
+            ],
+        )
+
+async def save_pdf_summary(
+    file_id: int,
+    max_length: int,
+    model: str,
+    summary: str,
+    source_word_count: Optional[int] = None,
+):
+    """
+    Store a generated summary and make it the file's current summary, along
+    with its key points and word count for the summary history.
+    """
+    await upsert_stored_summary(file_id, max_length, model, summary, source_word_count)
+    query = """
+    UPDATE pdf_files 
+    SET summary = :summary,
+        summary_generated_at = NOW(),
+        summary_key_points = :key_points,
+        summary_word_count = :word_count
+    WHERE id = :file_id
+    """
+    values = {
+        "summary": summary,
+        "key_points": json.dumps(summary_key_points(summary)),
+        "word_count": len(summary.split()),
+        "file_id": file_id,
+    }
+    await database.execute(query=query, values=values)
+
+async def adopt_stored_summary(file_record, max_length: int, model: str, stored):
+    """
+    Make a summary found by get_stored_summary (possibly stored for another
+    file with the same content) this file's current summary, so the summary
+    history lists it. Does nothing if it already is.
+    """
+    if stored["file_id"] == file_record["id"] and file_record["summary"] == stored["summary"]:
+        return
+    await save_pdf_summary(file_record["id"], max_length, model, stored["summary"], stored["source_word_count"])
@@ -0,0 +1,128 @@
+import os
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Root directory for artifacts derived from uploaded PDFs (extracted text, ...).
+# Kept outside of uploads/ so nothing here is ever served to clients.
+DOC_CACHE_DIR = os.getenv("DOC_CACHE_DIR", "cache")
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+# (path, size, mtime_ns) -> sha256 hex digest
+_sha_memo: Dict[Tuple[str, int, int], str] = {}
+_sha_memo_lock = threading.Lock()
+
+
+def file_sha256(file_path: str) -> str:
+    """
+    Compute the SHA-256 of a file, memoized on its path, size and mtime.
+
+    Args:
+        file_path (str): Path to the file
+
+    Returns:
+        str: Hex digest of the file contents
+    """
+    stat = os.stat(file_path)
+    memo_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    with _sha_memo_lock:
+        digest = _sha_memo.get(memo_key)
+    if digest:
+        return digest
+
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+            sha.update(block)
+    digest = sha.hexdigest()
+
+    with _sha_memo_lock:
+        _sha_memo[memo_key] = digest
+    return digest
+
+
+def remember_sha256(file_path: str, digest: str) -> None:
+    """Record a digest computed elsewhere (e.g. while saving an upload)."""
+    stat = os.stat(file_path)
+    with _sha_memo_lock:
+        _sha_memo[(os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)] = digest
+
+
+class DocumentCache:
+    """
+    Size-bounded on-disk key/value store for one kind of derived artifact.
+
+    Entries are plain files under DOC_CACHE_DIR/<namespace>. Reads refresh an
+    entry's mtime, and writes evict least recently used entries until the
+    namespace fits in max_bytes again.
+    """
+
+    def __init__(self, namespace: str, max_bytes: int):
+        self.directory = os.path.join(DOC_CACHE_DIR, namespace)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        safe_key = "".join(c if c.isalnum() or c in "-_." else "_" for c in key)
+        return os.path.join(self.directory, safe_key)
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put_bytes(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            logger.info(f"Not caching {key}: {len(data)} bytes exceeds cache size")
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def get_text(self, key: str) -> Optional[str]:
+        data = self.get_bytes(key)
+        return data.decode("utf-8") if data is not None else None
+
+    def put_text(self, key: str, text: str) -> None:
+        self.put_bytes(key, text.encode("utf-8"))
+
+    def _evict(self) -> None:
+        with self._lock:
+            entries = []
+            total = 0
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if not entry.is_file() or entry.name.endswith(".tmp"):
+                        continue
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+
+            if total <= self.max_bytes:
+                return
+
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,168 @@
+import os
+import sys
+import asyncio
+import multiprocessing
+import resource
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "2"))
+EXTRACTION_TIMEOUT_SECONDS = float(os.getenv("EXTRACTION_TIMEOUT_SECONDS", "120"))
+EXTRACTION_MAX_TASKS_PER_CHILD = int(os.getenv("EXTRACTION_MAX_TASKS_PER_CHILD", "50"))
+# Address-space (VSZ) ceiling of each worker process, counting the interpreter
+# and the entry script's imports: about 30 MB under uvicorn, about 160 MB under
+# worker.py, which imports numpy and the OpenAI client; 0 disables it
+EXTRACTION_MEMORY_LIMIT_MB = int(os.getenv("EXTRACTION_MEMORY_LIMIT_MB", "1024"))
+
+
+class ExtractionTimeout(Exception):
+    pass
+
+
+class ExtractionMemoryExceeded(Exception):
+    pass
+
+
+def _limit_memory(limit_bytes: int) -> None:
+    """Pool initializer: make allocations past limit_bytes raise MemoryError."""
+    if limit_bytes <= 0:
+        return
+    try:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            limit_bytes = min(limit_bytes, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit_bytes, hard))
+    except (ValueError, OSError) as e:
+        logger.warning(f"Could not set extraction memory limit: {str(e)}")
+
+
+class ExtractionPool:
+    """
+    Process pool for CPU-bound PDF work, shared by every request in a worker.
+
+    Jobs that exceed their timeout have their worker processes killed and the
+    pool is rebuilt, so a pathological PDF cannot pin a core forever. Each
+    worker process runs under an address-space limit of memory_limit_mb, so a
+    job that would exhaust the machine fails with ExtractionMemoryExceeded
+    instead. Worker processes are recycled after max_tasks_per_child jobs to
+    release memory leaked by the PDF parser.
+
+    Workers are started by a forkserver rather than forked from the serving
+    process, so they do not inherit its threads, connections or heap. Like
+    spawned processes, they do import the entry script as __mp_main__: under
+    uvicorn that is only uvicorn's CLI, but under worker.py it pulls in numpy
+    and the OpenAI client, which count towards memory_limit_mb. Entry scripts
+    must guard their startup code with `if __name__ == "__main__"`.
+    """
+
+    def __init__(self, workers: int, timeout: float, max_tasks_per_child: int, memory_limit_mb: int = 0):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.max_tasks_per_child = max(1, max_tasks_per_child)
+        self.memory_limit_mb = memory_limit_mb
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._jobs_submitted = 0
+        self._lock = threading.Lock()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        limits = {
+            "mp_context": multiprocessing.get_context("forkserver"),
+            "initializer": _limit_memory,
+            "initargs": (self.memory_limit_mb * 1024 * 1024,),
+        }
+        if sys.version_info >= (3, 11):
+            return ProcessPoolExecutor(
+                max_workers=self.workers,
+                max_tasks_per_child=self.max_tasks_per_child,
+                **limits,
+            )
+        # Older interpreters cannot recycle single children, so the whole pool
+        # is replaced once it has run max_tasks_per_child jobs per worker.
+        return ProcessPoolExecutor(max_workers=self.workers, **limits)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._new_executor()
+                self._jobs_submitted = 0
+                logger.info(f"Started PDF extraction pool with {self.workers} workers")
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _restart(self, kill: bool = False) -> None:
+        """
+        Replace the executor. Jobs already queued on the old one still run
+        there; with kill=True its processes are terminated first, so those
+        jobs fail with BrokenProcessPool and run() retries them on the new one.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, self._new_executor()
+            self._jobs_submitted = 0
+        if executor is None:
+            return
+        if kill:
+            # ProcessPoolExecutor has no public way to stop a running job.
+            for process in list(getattr(executor, "_processes", {}).values()):
+                process.terminate()
+        # Cancelling would raise CancelledError in other callers' awaits
+        executor.shutdown(wait=False)
+
+    def _submit(self, fn: Callable[..., Any], *args: Any):
+        if self._executor is None:
+            self.start()
+        if (
+            sys.version_info < (3, 11)
+            and self._jobs_submitted >= self.workers * self.max_tasks_per_child
+        ):
+            self._restart()
+        with self._lock:
+            self._jobs_submitted += 1
+            return self._executor.submit(fn, *args)
+
+    async def run(self, fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None) -> Any:
+        """
+        Run fn(*args) in a worker process and await its result.
+
+        Args:
+            fn: A picklable, module-level function
+            timeout (float): Seconds to wait before killing the job; defaults
+                to EXTRACTION_TIMEOUT_SECONDS
+
+        Returns:
+            The return value of fn
+        """
+        timeout = self.timeout if timeout is None else timeout
+        for attempt in range(2):
+            future = self._submit(fn, *args)
+            try:
+                return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"Extraction job {fn.__name__} timed out after {timeout}s; restarting pool")
+                self._restart(kill=True)
+                raise ExtractionTimeout(f"PDF processing took longer than {timeout:.0f} seconds")
+            except MemoryError:
+                # The worker survives, but replace it so its heap is returned
+                logger.error(f"Extraction job {fn.__name__} hit the {self.memory_limit_mb} MB memory limit")
+                self._restart()
+                raise ExtractionMemoryExceeded(f"PDF needs more than {self.memory_limit_mb} MB to process")
+            except BrokenProcessPool:
+                # Another job's timeout (or an OOM kill) took the pool down.
+                if attempt:
+                    raise
+                logger.warning("Extraction pool was broken; restarting and retrying once")
+                self._restart()
+
+
+extraction_pool = ExtractionPool(
+    EXTRACTION_WORKERS, EXTRACTION_TIMEOUT_SECONDS, EXTRACTION_MAX_TASKS_PER_CHILD,
+    EXTRACTION_MEMORY_LIMIT_MB,
+)
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI chat completions API, for load tests that
+should not spend money.
+
+    python fake_llm_server.py --port 8900 --latency lognormal:800:0.5 --error-rate 0.02
+
+Then point the API (and worker) at it:
+
+    OPENAI_BASE_URL=http://localhost:8900/v1 OPENAI_API_KEY=fake uvicorn app:app
+
+Responses are deterministic for a given prompt: quiz prompts get valid quiz
+JSON with the requested number of questions, every other prompt gets filler
+text sized to the prompt's requested word count and max_tokens. Latency is
+drawn from the configured distribution; errors and 429s are injected at the
+configured rates.
+"""
+import re
+import json
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+import argparse
+from typing import List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = (
+    "the document describes key concepts methods results and implications of the study "
+    "including definitions examples evidence limitations and recommendations for future work"
+).split()
+
+app = FastAPI(title="Fake LLM server")
+
+
+def parse_latency(spec: str):
+    """
+    Build a sampler (returning seconds) from "fixed:MS", "uniform:MIN_MS:MAX_MS",
+    "normal:MEAN_MS:STDDEV_MS" or "lognormal:MEDIAN_MS:SIGMA".
+    """
+    kind, *args = spec.split(":")
+    values = [float(a) for a in args]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0] / 1000
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == "normal" and len(values) == 2:
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1])) / 1000
+    if kind == "lognormal" and len(values) == 2:
+        return lambda rng: rng.lognormvariate(0, values[1]) * values[0] / 1000
+    raise ValueError(f"Invalid latency spec '{spec}'")
+
+
+class Settings:
+    latency = "fixed:300"
+    sampler = staticmethod(parse_latency("fixed:300"))
+    tokens_per_second = 200.0
+    error_rate = 0.0
+    rate_limit_rate = 0.0
+    seed = 0
+
+
+settings = Settings()
+
+
+def _rng(prompt: str) -> random.Random:
+    digest = hashlib.sha256(f"{settings.seed}:{prompt}".encode("utf-8")).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+def fake_quiz(num_questions: int, rng: random.Random) -> str:
+    questions = []
+    for i in range(num_questions):
+        topic = " ".join(rng.choice(WORDS) for _ in range(4))
+        answer = rng.choice("ABCD")
+        questions.append({
+            "question": f"Question {i + 1} {rng.randrange(10 ** 6)}: which statement about {topic} is correct?",
+            "options": {key: f"Statement {key} about {topic}" for key in "ABCD"},
+            "correct_answer": answer,
+            "explanation": f"Statement {answer} matches the document.",
+        })
+    return json.dumps({"quiz_title": "Quiz based on document content", "questions": questions}, indent=2)
+
+
+def fake_text(words: int, rng: random.Random) -> str:
+    sentences = []
+    remaining = words
+    while remaining > 0:
+        length = min(remaining, rng.randint(8, 20))
+        sentence = " ".join(rng.choice(WORDS) for _ in range(length))
+        sentences.append(sentence.capitalize() + ".")
+        remaining -= length
+    return " ".join(sentences)
+
+
+def fake_response(messages: List[dict], max_tokens: int) -> str:
+    prompt = "\n".join(str(m.get("content") or "") for m in messages)
+    rng = _rng(prompt)
+    quiz = re.search(r"create a quiz with (\d+) multiple-choice questions", prompt)
+    if quiz:
+        return fake_quiz(int(quiz.group(1)), rng)
+    requested = re.search(r"approximately (\d+) words|about (\d+) words", prompt)
+    words = int(next(g for g in requested.groups() if g)) if requested else 150
+    # Roughly 0.75 words per token
+    return fake_text(min(words, int(max_tokens * 0.75)), rng)
+
+
+def _chunks(text: str) -> List[str]:
+    return re.findall(r"\S+\s*|\s+", text)
+
+
+def _error(status: int, message: str, kind: str, headers: Optional[dict] = None) -> JSONResponse:
+    return JSONResponse(
+        {"error": {"message": message, "type": kind, "param": None, "code": None}},
+        status_code=status,
+        headers=headers,
+    )
+
+
+@app.get("/v1/models")
+async def list_models():
+    return {"object": "list", "data": [{"id": "gpt-3.5-turbo", "object": "model", "owned_by": "fake"}]}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    messages = body.get("messages", [])
+    model = body.get("model", "gpt-3.5-turbo")
+    max_tokens = int(body.get("max_tokens") or 512)
+
+    # Injected failures are random per call, not per prompt
+    roll = random.random()
+    if roll < settings.rate_limit_rate:
+        return _error(429, "Rate limit reached (injected)", "requests", {"retry-after": "1"})
+    if roll < settings.rate_limit_rate + settings.error_rate:
+        return _error(500, "Internal server error (injected)", "server_error")
+
+    content = fake_response(messages, max_tokens)
+    prompt_tokens = sum(len(str(m.get("content") or "")) for m in messages) // 4
+    completion_tokens = len(content) // 4
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+    created = int(time.time())
+    first_token_delay = settings.sampler(random.Random())
+
+    if not body.get("stream"):
+        await asyncio.sleep(first_token_delay + completion_tokens / settings.tokens_per_second)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    async def event_stream():
+        def chunk(delta: dict, finish_reason: Optional[str] = None) -> str:
+            data = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return f"data: {json.dumps(data)}\n\n"
+
+        await asyncio.sleep(first_token_delay)
+        yield chunk({"role": "assistant", "content": ""})
+        for piece in _chunks(content):
+            # About one word per token
+            await asyncio.sleep(1 / settings.tokens_per_second)
+            yield chunk({"content": piece})
+        yield chunk({}, "stop")
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", default=settings.latency,
+                        help="Time to first token: fixed:MS, uniform:MIN:MAX, normal:MEAN:STDDEV or lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--tokens-per-second", type=float, default=settings.tokens_per_second,
+                        help="Generation speed after the first token")
+    parser.add_argument("--error-rate", type=float, default=settings.error_rate,
+                        help="Fraction of calls answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=settings.rate_limit_rate,
+                        help="Fraction of calls answered with 429")
+    parser.add_argument("--seed", type=int, default=settings.seed,
+                        help="Changes the canned responses; the same seed and prompt always give the same text")
+    args = parser.parse_args()
+
+    settings.latency = args.latency
+    settings.sampler = parse_latency(args.latency)
+    settings.tokens_per_second = args.tokens_per_second
+    settings.error_rate = args.error_rate
+    settings.rate_limit_rate = args.rate_limit_rate
+    settings.seed = args.seed
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
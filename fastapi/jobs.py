@@ -0,0 +1,189 @@
+import json
+from typing import Any, Dict, Optional
+
+from database import database
+
+# Job states: queued -> running -> succeeded | failed (running jobs whose
+# worker died are put back to queued once their lock goes stale)
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+# Seconds before a retry, multiplied by 2 ** (attempts - 1)
+RETRY_BACKOFF_SECONDS = 10
+
+
+async def ensure_ai_jobs_table():
+    await database.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ai_jobs (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES users(user_id) ON DELETE CASCADE,
+            kind VARCHAR(50) NOT NULL,
+            payload JSONB NOT NULL,
+            status VARCHAR(20) NOT NULL DEFAULT 'queued',
+            progress INTEGER NOT NULL DEFAULT 0,
+            result JSONB,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 3,
+            locked_by VARCHAR(100),
+            locked_at TIMESTAMP,
+            run_after TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+        """
+    )
+    await database.execute(
+        "CREATE INDEX IF NOT EXISTS idx_ai_jobs_queued ON ai_jobs(run_after, id) WHERE status = 'queued'"
+    )
+    await database.execute(
+        "CREATE INDEX IF NOT EXISTS idx_ai_jobs_running ON ai_jobs(locked_at) WHERE status = 'running'"
+    )
+    await database.execute("CREATE INDEX IF NOT EXISTS idx_ai_jobs_user ON ai_jobs(user_id)")
+
+
+async def enqueue_job(kind: str, payload: Dict[str, Any], user_id: Optional[int] = None, max_attempts: int = 3) -> int:
+    query = """
+    INSERT INTO ai_jobs (user_id, kind, payload, max_attempts)
+    VALUES (:user_id, :kind, :payload, :max_attempts)
+    RETURNING id
+    """
+    values = {"user_id": user_id, "kind": kind, "payload": json.dumps(payload), "max_attempts": max_attempts}
+    return await database.fetch_val(query=query, values=values)
+
+
+async def claim_job(worker_id: str):
+    """
+    Atomically take the oldest runnable job. SKIP LOCKED lets any number of
+    workers, on any number of nodes, poll the table without blocking each
+    other or claiming the same row.
+    """
+    query = """
+    UPDATE ai_jobs
+    SET status = 'running',
+        locked_by = :worker_id,
+        locked_at = NOW(),
+        attempts = attempts + 1,
+        updated_at = NOW()
+    WHERE id = (
+        SELECT id FROM ai_jobs
+        WHERE status = 'queued' AND run_after <= NOW()
+        ORDER BY run_after, id
+        FOR UPDATE SKIP LOCKED
+        LIMIT 1
+    )
+    RETURNING *
+    """
+    return await database.fetch_one(query=query, values={"worker_id": worker_id})
+
+
+async def update_job_progress(job_id: int, progress: int):
+    # Also refreshes locked_at, which doubles as the worker's heartbeat
+    query = """
+    UPDATE ai_jobs
+    SET progress = :progress, locked_at = NOW(), updated_at = NOW()
+    WHERE id = :id AND status = 'running'
+    """
+    await database.execute(query=query, values={"id": job_id, "progress": max(0, min(100, progress))})
+
+
+async def heartbeat_job(job_id: int, worker_id: str) -> bool:
+    """Refresh a running job's lease; False if worker_id no longer holds it."""
+    query = """
+    UPDATE ai_jobs
+    SET locked_at = NOW(), updated_at = NOW()
+    WHERE id = :id AND status = 'running' AND locked_by = :worker_id
+    RETURNING id
+    """
+    return await database.fetch_val(query=query, values={"id": job_id, "worker_id": worker_id}) is not None
+
+
+# complete_job, fail_job and defer_job only apply while worker_id still holds
+# the job, so a worker whose job was requeued as stale cannot overwrite the
+# outcome of the worker that took it over. They return whether they applied.
+
+async def complete_job(job_id: int, worker_id: str, result: Dict[str, Any]) -> bool:
+    query = """
+    UPDATE ai_jobs
+    SET status = 'succeeded', progress = 100, result = :result, error = NULL,
+        locked_by = NULL, locked_at = NULL, updated_at = NOW(), finished_at = NOW()
+    WHERE id = :id AND locked_by = :worker_id
+    RETURNING id
+    """
+    values = {"id": job_id, "worker_id": worker_id, "result": json.dumps(result)}
+    return await database.fetch_val(query=query, values=values) is not None
+
+
+async def fail_job(job_id: int, worker_id: str, error: str, retryable: bool = True) -> bool:
+    """Requeue the job with exponential backoff, or mark it failed for good."""
+    query = """
+    UPDATE ai_jobs
+    SET status = CASE WHEN :retryable AND attempts < max_attempts THEN 'queued' ELSE 'failed' END,
+        run_after = NOW() + make_interval(secs => CAST(:backoff AS DOUBLE PRECISION) * power(2, GREATEST(attempts - 1, 0))),
+        finished_at = CASE WHEN :retryable AND attempts < max_attempts THEN NULL ELSE NOW() END,
+        error = :error, locked_by = NULL, locked_at = NULL, updated_at = NOW()
+    WHERE id = :id AND locked_by = :worker_id
+    RETURNING id
+    """
+    values = {
+        "id": job_id,
+        "worker_id": worker_id,
+        "error": error,
+        "retryable": retryable,
+        "backoff": RETRY_BACKOFF_SECONDS,
+    }
+    return await database.fetch_val(query=query, values=values) is not None
+
+
+async def defer_job(job_id: int, worker_id: str, delay_seconds: float, reason: str) -> bool:
+    """Put a running job back in the queue without using up one of its attempts."""
+    query = """
+    UPDATE ai_jobs
+    SET status = 'queued',
+        attempts = GREATEST(attempts - 1, 0),
+        run_after = NOW() + make_interval(secs => CAST(:delay AS DOUBLE PRECISION)),
+        error = :reason, locked_by = NULL, locked_at = NULL, updated_at = NOW()
+    WHERE id = :id AND locked_by = :worker_id
+    RETURNING id
+    """
+    values = {"id": job_id, "worker_id": worker_id, "delay": delay_seconds, "reason": reason}
+    return await database.fetch_val(query=query, values=values) is not None
+
+
+async def requeue_stale_jobs(stale_after_seconds: int) -> int:
+    """Return jobs whose worker stopped heartbeating to the queue."""
+    query = """
+    UPDATE ai_jobs
+    SET status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END,
+        error = 'Worker stopped responding',
+        finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE NOW() END,
+        locked_by = NULL, locked_at = NULL, updated_at = NOW()
+    WHERE status = 'running' AND locked_at < NOW() - make_interval(secs => CAST(:stale AS DOUBLE PRECISION))
+    RETURNING id
+    """
+    rows = await database.fetch_all(query=query, values={"stale": stale_after_seconds})
+    return len(rows)
+
+
+async def get_job(job_id: int):
+    query = "SELECT * FROM ai_jobs WHERE id = :id"
+    return await database.fetch_one(query=query, values={"id": job_id})
+
+
+def serialize_job(job) -> Dict[str, Any]:
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "attempts": job["attempts"],
+        "result": json.loads(job["result"]) if job["result"] else None,
+        "error": job["error"] if job["status"] == JOB_FAILED else None,
+        "created_at": job["created_at"].isoformat(),
+        "updated_at": job["updated_at"].isoformat(),
+        "finished_at": job["finished_at"].isoformat() if job["finished_at"] else None,
+    }
@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+from openai import AsyncOpenAI, RateLimitError
+
+from context_packing import estimate_tokens
+from rate_limit import RateLimitExceeded, governor
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+# Point at another OpenAI-compatible server, e.g. fake_llm_server.py for load tests
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+# Upper bound on requests in flight to OpenAI from this process
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "16"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "32"))
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "60"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2000"))
+
+# One keep-alive pool for every AI call, so requests reuse TLS connections
+_http_client = httpx.AsyncClient(
+    limits=httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+        keepalive_expiry=60,
+    ),
+    timeout=httpx.Timeout(OPENAI_TIMEOUT_SECONDS, connect=10),
+)
+
+client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=OPENAI_BASE_URL, http_client=_http_client)
+
+_upstream_slots = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+
+
+class ResponseCache:
+    """
+    In-process LRU cache of completion texts with a time-to-live.
+
+    Keys hash everything that determines the output (model, messages and
+    generation parameters), so identical prompts share an entry.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, str]], max_tokens: int, temperature: float) -> str:
+        payload = json.dumps(
+            {"model": model, "messages": messages, "max_tokens": max_tokens, "temperature": temperature},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: str, value: str) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+response_cache = ResponseCache(LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_ENTRIES)
+
+# Identical completions in flight at the same time share one upstream call
+completion_flights = SingleFlight()
+
+
+async def chat_completion(
+    messages: List[Dict[str, str]],
+    max_tokens: int,
+    temperature: float = 0.3,
+    model: Optional[str] = None,
+    use_cache: bool = True,
+) -> str:
+    """
+    Run a chat completion and return the text of the first choice.
+
+    Identical requests are answered from the response cache, and identical
+    requests already in flight are joined rather than sent again. Otherwise
+    waits for the shared RPM/TPM budget (see rate_limit) and a free upstream
+    slot, so at most OPENAI_MAX_CONCURRENCY calls are in flight and the rest
+    queue without blocking the event loop. Raises RateLimitExceeded when the
+    budget cannot be met in time or OpenAI itself answers 429.
+
+    Args:
+        messages (list): Chat messages in OpenAI format
+        max_tokens (int): Completion token limit
+        temperature (float): Sampling temperature
+        model (str): Model name; defaults to OPENAI_MODEL
+        use_cache (bool): False skips the cache lookup and in-flight joining
+            (e.g. "regenerate"); the fresh result still replaces the cached one
+
+    Returns:
+        str: The completion text
+    """
+    model = model or OPENAI_MODEL
+    key = response_cache.make_key(model, messages, max_tokens, temperature)
+    if not use_cache:
+        return await _complete(key, model, messages, max_tokens, temperature)
+
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached
+    return await completion_flights.do(
+        key, lambda: _complete(key, model, messages, max_tokens, temperature)
+    )
+
+
+def _estimated_tokens(model: str, messages: List[Dict[str, str]], max_tokens: int) -> int:
+    # OpenAI counts the prompt plus max_tokens against the TPM limit
+    prompt = "\n".join(m.get("content") or "" for m in messages)
+    return estimate_tokens(prompt, model) + 4 * len(messages) + max_tokens
+
+
+def _rate_limited(error: RateLimitError) -> RateLimitExceeded:
+    try:
+        retry_after = float(error.response.headers.get("retry-after", "1"))
+    except (AttributeError, ValueError):
+        retry_after = 1.0
+    logger.warning(f"OpenAI rate limit hit; pausing calls for {retry_after:.1f}s")
+    governor.penalize(retry_after)
+    return RateLimitExceeded(retry_after)
+
+
+async def _complete(
+    key: str,
+    model: str,
+    messages: List[Dict[str, str]],
+    max_tokens: int,
+    temperature: float,
+) -> str:
+    estimated = _estimated_tokens(model, messages, max_tokens)
+    await governor.acquire(estimated)
+    async with _upstream_slots:
+        try:
+            response = await client.chat.completions.create(
+                model=model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+            )
+        except RateLimitError as e:
+            raise _rate_limited(e)
+    if response.usage is not None:
+        governor.settle(estimated, response.usage.prompt_tokens + max_tokens)
+    content = response.choices[0].message.content or ""
+    if content:
+        response_cache.put(key, content)
+    return content
+
+
+async def stream_chat_completion(
+    messages: List[Dict[str, str]],
+    max_tokens: int,
+    temperature: float = 0.3,
+    model: Optional[str] = None,
+    use_cache: bool = True,
+) -> AsyncIterator[str]:
+    """
+    Stream a chat completion, yielding text deltas as they arrive.
+
+    A cached response is yielded as a single delta. Otherwise the call waits
+    for the rate-limit budget like chat_completion, and the upstream slot is
+    held until the stream ends. Closing the generator early (e.g. on client
+    disconnect) closes the HTTP response, which stops generation upstream;
+    only streams that complete are cached.
+    """
+    model = model or OPENAI_MODEL
+    key = response_cache.make_key(model, messages, max_tokens, temperature)
+    if use_cache:
+        cached = response_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    await governor.acquire(_estimated_tokens(model, messages, max_tokens))
+    async with _upstream_slots:
+        try:
+            stream = await client.chat.completions.create(
+                model=model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=True,
+            )
+        except RateLimitError as e:
+            raise _rate_limited(e)
+        parts = []
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield parts[-1]
+        finally:
+            await stream.close()
+    if parts:
+        response_cache.put(key, "".join(parts))
+
+
+async def close_client():
+    await client.close()
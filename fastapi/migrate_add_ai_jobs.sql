@@ -0,0 +1,24 @@
+-- Migration: add ai_jobs queue table used by the API and worker.py
+-- Safe to run multiple times (IF NOT EXISTS)
+
+CREATE TABLE IF NOT EXISTS ai_jobs (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER REFERENCES users(user_id) ON DELETE CASCADE,
+    kind VARCHAR(50) NOT NULL,
+    payload JSONB NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued', -- queued, running, succeeded, failed
+    progress INTEGER NOT NULL DEFAULT 0,
+    result JSONB,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    locked_by VARCHAR(100),
+    locked_at TIMESTAMP, -- refreshed by the worker as a heartbeat
+    run_after TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_ai_jobs_queued ON ai_jobs(run_after, id) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_ai_jobs_running ON ai_jobs(locked_at) WHERE status = 'running';
+CREATE INDEX IF NOT EXISTS idx_ai_jobs_user ON ai_jobs(user_id);
@@ -0,0 +1,11 @@
+-- Migration: add columns written at upload and by the background ingestion job
+-- Safe to run multiple times (IF NOT EXISTS)
+
+ALTER TABLE pdf_files
+ADD COLUMN IF NOT EXISTS ingest_status VARCHAR(20) NOT NULL DEFAULT 'pending',
+ADD COLUMN IF NOT EXISTS ingest_error TEXT,
+ADD COLUMN IF NOT EXISTS ingested_at TIMESTAMP,
+ADD COLUMN IF NOT EXISTS page_count INTEGER,
+ADD COLUMN IF NOT EXISTS word_count INTEGER,
+ADD COLUMN IF NOT EXISTS content_sha256 CHAR(64),
+ADD COLUMN IF NOT EXISTS size_bytes BIGINT;
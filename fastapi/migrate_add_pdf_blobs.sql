@@ -0,0 +1,42 @@
+-- Migration: add pdf_blobs, the content-addressed store of uploaded PDFs
+-- Safe to run multiple times (IF NOT EXISTS). Move files uploaded earlier
+-- into the store with `python migrate_uploads_to_blobs.py`.
+
+CREATE TABLE IF NOT EXISTS pdf_blobs (
+    content_sha256 CHAR(64) PRIMARY KEY,
+    file_path VARCHAR(500) NOT NULL,
+    size_bytes BIGINT NOT NULL,
+    ref_count INTEGER NOT NULL DEFAULT 0, -- pdf_files rows with this hash, kept by pdf_files_blob_refs
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_referenced_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_pdf_files_content_sha256 ON pdf_files(content_sha256);
+
+CREATE OR REPLACE FUNCTION pdf_blobs_track_refs() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.content_sha256 IS NOT DISTINCT FROM NEW.content_sha256 THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.content_sha256 IS NOT NULL THEN
+        UPDATE pdf_blobs
+        SET ref_count = ref_count - 1, last_referenced_at = NOW()
+        WHERE content_sha256 = OLD.content_sha256;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.content_sha256 IS NOT NULL THEN
+        UPDATE pdf_blobs
+        SET ref_count = ref_count + 1, last_referenced_at = NOW()
+        WHERE content_sha256 = NEW.content_sha256;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'pdf_files_blob_refs') THEN
+        CREATE TRIGGER pdf_files_blob_refs
+        AFTER INSERT OR DELETE OR UPDATE OF content_sha256 ON pdf_files
+        FOR EACH ROW EXECUTE FUNCTION pdf_blobs_track_refs();
+    END IF;
+END
+$$;
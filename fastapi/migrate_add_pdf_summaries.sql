@@ -0,0 +1,13 @@
+-- Migration: add pdf_summaries table so /ai/summarize can serve stored summaries
+-- Safe to run multiple times (IF NOT EXISTS)
+
+CREATE TABLE IF NOT EXISTS pdf_summaries (
+    id SERIAL PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES pdf_files(id) ON DELETE CASCADE,
+    max_length INTEGER NOT NULL,
+    model VARCHAR(100) NOT NULL,
+    summary TEXT NOT NULL,
+    source_word_count INTEGER,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (file_id, max_length, model)
+);
@@ -0,0 +1,13 @@
+-- Migration: add question_bank, the per-file pool of generated quiz questions
+-- Safe to run multiple times (IF NOT EXISTS). Only questions the server
+-- generated are stored; quizzes saved by clients are not.
+
+CREATE TABLE IF NOT EXISTS question_bank (
+    id SERIAL PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES pdf_files(id) ON DELETE CASCADE,
+    difficulty VARCHAR(10) NOT NULL,
+    question_key TEXT NOT NULL, -- normalized question text, for deduplication
+    question JSONB NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (file_id, difficulty, question_key)
+);
@@ -0,0 +1,11 @@
+-- Migration: store summary key points and word counts on pdf_files
+-- Safe to run multiple times (IF NOT EXISTS). Existing summaries are
+-- backfilled by the API (and worker.py) on startup.
+
+ALTER TABLE pdf_files
+ADD COLUMN IF NOT EXISTS summary_key_points JSONB,
+ADD COLUMN IF NOT EXISTS summary_word_count INTEGER;
+
+CREATE INDEX IF NOT EXISTS idx_pdf_files_user_summary
+ON pdf_files(user_id, summary_generated_at DESC)
+WHERE summary IS NOT NULL;
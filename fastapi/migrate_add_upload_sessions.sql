@@ -0,0 +1,17 @@
+-- Migration: add upload_sessions, the state of resumable uploads
+-- Safe to run multiple times (IF NOT EXISTS). worker.py deletes sessions
+-- idle for longer than UPLOAD_SESSION_TTL_SECONDS.
+
+CREATE TABLE IF NOT EXISTS upload_sessions (
+    id CHAR(32) PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    name VARCHAR(255) NOT NULL,
+    total_bytes BIGINT NOT NULL,
+    received_bytes BIGINT NOT NULL DEFAULT 0,
+    staging_path VARCHAR(500) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'open', -- open, finalizing, finalized
+    file_id INTEGER REFERENCES pdf_files(id) ON DELETE SET NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_upload_sessions_updated ON upload_sessions(updated_at);
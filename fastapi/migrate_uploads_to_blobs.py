@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Move PDFs uploaded before content-addressed storage into uploads/blobs/, so
+identical files are kept once and share their summaries and question banks.
+
+    python migrate_uploads_to_blobs.py
+
+Safe to run more than once, and while the API is serving.
+"""
+import asyncio
+import logging
+
+from blob_store import ensure_pdf_blobs_table, migrate_legacy_uploads
+from database import connect_db, disconnect_db, ensure_pdf_ingest_columns
+
+
+async def main():
+    logging.basicConfig(level=logging.INFO)
+    await connect_db()
+    try:
+        await ensure_pdf_ingest_columns()
+        await ensure_pdf_blobs_table()
+        result = await migrate_legacy_uploads()
+    finally:
+        await disconnect_db()
+    print(
+        f"Moved {result['migrated']} files, freed {result['bytes_freed'] / (1024 * 1024):.1f} MB"
+        f" ({result['missing']} rows point to files that no longer exist)"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,121 @@
+import os
+import logging
+from typing import Iterator, Optional, Tuple
+
+import PyPDF2
+
+logger = logging.getLogger(__name__)
+
+# Kept free of app imports: this module is loaded by the extraction worker
+# processes, which should not pay for the OpenAI client or the database.
+
+# (first_page, last_page), 1-based and inclusive; last_page None means "to the end"
+PageRange = Tuple[int, Optional[int]]
+
+# Hard limits for one extraction, whatever the caller asks for; text past
+# them is dropped so a huge upload cannot exhaust a worker
+EXTRACTION_MAX_PAGES = int(os.getenv("EXTRACTION_MAX_PAGES", "1000"))
+EXTRACTION_MAX_CHARS = int(os.getenv("EXTRACTION_MAX_CHARS", str(5 * 1024 * 1024)))
+
+
+def parse_page_range(value: Optional[str]) -> Optional[PageRange]:
+    """
+    Parse a page range such as "41-60", "7" or "41-".
+    
+    Args:
+        value (str): The range as typed by the user; empty means all pages
+        
+    Returns:
+        tuple: (first_page, last_page) or None for the whole document
+        
+    Raises:
+        ValueError: If the range is malformed
+    """
+    if value is None or not value.strip():
+        return None
+    first, sep, last = value.replace(" ", "").replace("–", "-").partition("-")
+    try:
+        first_page = int(first)
+        last_page = (int(last) if last else None) if sep else first_page
+    except ValueError:
+        raise ValueError(f"Invalid page range '{value}'. Use e.g. 41-60")
+    if first_page < 1 or (last_page is not None and last_page < first_page):
+        raise ValueError(f"Invalid page range '{value}'. Use e.g. 41-60")
+    return first_page, last_page
+
+
+def iter_pdf_pages(
+    file_path: str,
+    pages: Optional[PageRange] = None,
+    max_pages: Optional[int] = None,
+) -> Iterator[Tuple[int, str]]:
+    """
+    Lazily extract text page by page. Only the requested pages are parsed.
+    
+    Args:
+        file_path (str): Path to the PDF file
+        pages (tuple): Optional (first_page, last_page) range
+        max_pages (int): Parse at most this many pages; defaults to
+            EXTRACTION_MAX_PAGES
+        
+    Yields:
+        tuple: (page_number, page_text) with 1-based page numbers
+    """
+    max_pages = EXTRACTION_MAX_PAGES if max_pages is None else max_pages
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        total = len(pdf_reader.pages)
+        first, last = pages or (1, None)
+        last = total if last is None else min(last, total)
+        if last - first + 1 > max_pages:
+            logger.warning(f"{file_path}: only the first {max_pages} of pages {first}-{last} are extracted")
+            last = first + max_pages - 1
+        for page_num in range(first - 1, last):
+            yield page_num + 1, pdf_reader.pages[page_num].extract_text() or ""
+
+
+def count_pdf_pages(file_path: str) -> int:
+    with open(file_path, 'rb') as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+
+def extract_text_from_pdf(
+    file_path: str,
+    pages: Optional[PageRange] = None,
+    max_chars: Optional[int] = None,
+) -> str:
+    """
+    Extract text from a PDF file using PyPDF2.
+    
+    Args:
+        file_path (str): Path to the PDF file
+        pages (tuple): Optional (first_page, last_page) range to extract
+        max_chars (int): Stop parsing once this many characters are collected;
+            never more than EXTRACTION_MAX_CHARS
+        
+    Returns:
+        str: Extracted text from the PDF
+    """
+    limit = EXTRACTION_MAX_CHARS if max_chars is None else min(max_chars, EXTRACTION_MAX_CHARS)
+    try:
+        # Pages are collected in a list and joined once, and nothing past the
+        # limit is kept, so memory stays proportional to the result
+        parts = []
+        size = 0
+        for _, page_text in iter_pdf_pages(file_path, pages):
+            if size + len(page_text) > limit:
+                parts.append(page_text[:max(0, limit - size)])
+                if max_chars is None:
+                    logger.warning(f"{file_path}: text truncated at {limit} characters")
+                break
+            parts.append(page_text)
+            size += len(page_text) + 1
+        
+        return "\n".join(parts).strip()
+    
+    except MemoryError:
+        # Let the extraction pool report it as ExtractionMemoryExceeded
+        raise
+    except Exception as e:
+        logger.error(f"Error extracting text from PDF {file_path}: {str(e)}")
+        raise Exception(f"Failed to extract text from PDF: {str(e)}")
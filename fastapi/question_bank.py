@@ -0,0 +1,130 @@
+import json
+import logging
+from typing import List, Optional
+
+from ai_utils import generate_quiz_from_pdf, question_key
+from database import SAME_CONTENT_FILE_IDS, database
+from quiz_parser import normalize_question
+
+logger = logging.getLogger(__name__)
+
+
+async def ensure_question_bank_table():
+    await database.execute(
+        """
+        CREATE TABLE IF NOT EXISTS question_bank (
+            id SERIAL PRIMARY KEY,
+            file_id INTEGER NOT NULL REFERENCES pdf_files(id) ON DELETE CASCADE,
+            difficulty VARCHAR(10) NOT NULL,
+            question_key TEXT NOT NULL,
+            question JSONB NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (file_id, difficulty, question_key)
+        )
+        """
+    )
+    # The unique constraint's index serves lookups by (file_id, difficulty)
+
+
+async def add_questions(file_id: int, difficulty: str, questions: list) -> int:
+    """
+    Store valid questions for a file and difficulty. Only pass questions the
+    server generated for this file: the bank is shared by every file with the
+    same content and served without asking the model again. Duplicates are
+    ignored. Returns the number of questions offered.
+    """
+    values = []
+    for item in questions:
+        question = normalize_question(item)
+        if question is None:
+            continue
+        values.append({
+            "file_id": file_id,
+            "difficulty": difficulty,
+            "question_key": question_key(question),
+            "question": json.dumps(question),
+        })
+    if not values:
+        return 0
+    query = """
+    INSERT INTO question_bank (file_id, difficulty, question_key, question)
+    SELECT :file_id, :difficulty, :question_key, :question
+    WHERE EXISTS (SELECT 1 FROM pdf_files WHERE id = :file_id)
+    ON CONFLICT (file_id, difficulty, question_key) DO NOTHING
+    """
+    await database.execute_many(query=query, values=values)
+    return len(values)
+
+
+async def sample_questions(file_id: int, difficulty: str, limit: int) -> List[dict]:
+    """Sample banked questions of this file and of any file with the same content."""
+    query = f"""
+    SELECT question FROM (
+        SELECT DISTINCT ON (question_key) question
+        FROM question_bank
+        WHERE file_id IN ({SAME_CONTENT_FILE_IDS}) AND difficulty = :difficulty
+        ORDER BY question_key
+    ) AS shared
+    ORDER BY random()
+    LIMIT :limit
+    """
+    rows = await database.fetch_all(
+        query=query, values={"file_id": file_id, "difficulty": difficulty, "limit": limit}
+    )
+    return [json.loads(row["question"]) for row in rows]
+
+
+async def quiz_from_bank(
+    file_id: int,
+    file_path: str,
+    num_questions: int = 5,
+    difficulty: str = "medium",
+    use_cache: bool = True,
+    word_count: Optional[int] = None,
+) -> dict:
+    """
+    Build a quiz for a whole file, drawing on its question bank first.
+
+    Up to num_questions are sampled from the bank and only the missing ones
+    are generated (told not to repeat the sampled questions); new questions
+    are added to the bank. With use_cache=False the bank is not read and a
+    completely new quiz is generated.
+
+    Returns:
+        dict: Same shape as generate_quiz_from_pdf, plus 'banked_questions'
+    """
+    banked = await sample_questions(file_id, difficulty, num_questions) if use_cache else []
+    questions = list(banked)
+    source_word_count = word_count
+    quiz_title = "Quiz based on document content"
+
+    missing = num_questions - len(banked)
+    if missing > 0:
+        result = await generate_quiz_from_pdf(
+            file_path, missing, difficulty, use_cache=use_cache,
+            avoid=[q["question"] for q in banked],
+        )
+        source_word_count = result["source_word_count"]
+        quiz_title = result["quiz"].get("quiz_title") or quiz_title
+        generated = result["quiz"].get("questions", [])
+        try:
+            await add_questions(file_id, difficulty, generated)
+        except Exception as e:
+            logger.warning(f"Could not add questions to the bank for file {file_id}: {str(e)}")
+        seen = {question_key(q) for q in banked}
+        for item in generated:
+            question = normalize_question(item)
+            if question is None or question_key(question) in seen:
+                continue
+            seen.add(question_key(question))
+            questions.append(question)
+
+    questions = questions[:num_questions]
+    logger.info(f"Quiz for file {file_id}: {len(banked)} questions from the bank, {len(questions) - len(banked)} generated")
+    return {
+        "quiz": {"quiz_title": quiz_title, "questions": questions},
+        "source_word_count": source_word_count,
+        "num_questions": len(questions),
+        "difficulty": difficulty,
+        "banked_questions": len(banked),
+    }
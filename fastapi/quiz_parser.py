@@ -0,0 +1,110 @@
+import json
+from typing import Any, List, Optional, Tuple
+
+QUIZ_OPTION_KEYS = ("A", "B", "C", "D")
+
+
+class QuizStreamParser:
+    """
+    Incremental parser for the quiz JSON the model streams back.
+
+    feed() takes text deltas as they arrive and returns every question object
+    whose closing brace has arrived since the last call. A question object is
+    any JSON object that is a direct element of an array, which covers both
+    {"questions": [...]} and a bare [...] response. Text outside the JSON (a
+    preamble, Markdown fences) is skipped. Objects that do not parse are counted
+    in `broken` instead of failing the rest of the response.
+    """
+
+    def __init__(self):
+        self.broken = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._item: Optional[List[str]] = None
+        self._item_depth = 0
+
+    def feed(self, chunk: str) -> List[Any]:
+        completed = []
+        for char in chunk:
+            if self._item is not None:
+                self._item.append(char)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                if self._stack:
+                    self._in_string = True
+            elif char in "{[":
+                if char == "{" and self._item is None and self._stack and self._stack[-1] == "[":
+                    self._item = [char]
+                    self._item_depth = len(self._stack) + 1
+                self._stack.append(char)
+            elif char in "}]":
+                if not self._stack:
+                    continue
+                self._stack.pop()
+                if self._item is not None and len(self._stack) < self._item_depth:
+                    raw = "".join(self._item)
+                    self._item = None
+                    try:
+                        completed.append(json.loads(raw))
+                    except json.JSONDecodeError:
+                        self.broken += 1
+        return completed
+
+
+def normalize_question(item: Any) -> Optional[dict]:
+    """
+    Validate one generated question and return it in the standard shape
+    (question, options A-D, correct_answer, explanation), or None if it is
+    unusable.
+    """
+    if not isinstance(item, dict):
+        return None
+    question = item.get("question")
+    options = item.get("options")
+    if not isinstance(question, str) or not question.strip():
+        return None
+    if isinstance(options, list) and len(options) == len(QUIZ_OPTION_KEYS):
+        options = dict(zip(QUIZ_OPTION_KEYS, options))
+    if not isinstance(options, dict) or sorted(options) != list(QUIZ_OPTION_KEYS):
+        return None
+    if not all(isinstance(v, str) and v.strip() for v in options.values()):
+        return None
+    answer = str(item.get("correct_answer") or "").strip().upper()[:1]
+    if answer not in options:
+        return None
+    return {
+        "question": question.strip(),
+        "options": {key: options[key].strip() for key in QUIZ_OPTION_KEYS},
+        "correct_answer": answer,
+        "explanation": str(item.get("explanation") or "").strip(),
+    }
+
+
+def parse_quiz_questions(text: str) -> Tuple[List[dict], int]:
+    """
+    Recover the valid questions from a complete quiz response, even when the
+    response as a whole is not valid JSON.
+
+    Returns:
+        tuple: (valid questions, number of broken or invalid ones)
+    """
+    parser = QuizStreamParser()
+    questions = []
+    invalid = 0
+    for item in parser.feed(text):
+        question = normalize_question(item)
+        if question is None:
+            invalid += 1
+        else:
+            questions.append(question)
+    return questions, invalid + parser.broken
@@ -0,0 +1,156 @@
+import os
+import math
+import time
+import asyncio
+import logging
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# OpenAI account limits this process may use. Split them between processes
+# when several API instances and workers share one key.
+OPENAI_RPM_LIMIT = int(os.getenv("OPENAI_RPM_LIMIT", "3500"))
+OPENAI_TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", "200000"))
+# How long a call may queue for budget before it is rejected
+RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("RATE_LIMIT_MAX_WAIT_SECONDS", "10"))
+# Calls allowed to queue at once; further calls are rejected immediately
+RATE_LIMIT_MAX_QUEUE = int(os.getenv("RATE_LIMIT_MAX_QUEUE", "200"))
+
+
+class RateLimitExceeded(HTTPException):
+    """
+    The OpenAI budget is exhausted. Raised from the AI layer and passed through
+    the routes' `except HTTPException` clauses as a 429 with Retry-After.
+    """
+
+    def __init__(self, retry_after: float):
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(
+            status_code=429,
+            detail="The AI service is busy, please retry shortly",
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+
+class TokenBucket:
+    """Bucket of `capacity` units refilled continuously over one minute."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available (0 if they are now)."""
+        self._refill()
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def available(self) -> float:
+        self._refill()
+        return max(0.0, self.level)
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.level -= amount
+
+    def drain(self, seconds: float) -> None:
+        """Leave the bucket empty for at least `seconds`."""
+        self._refill()
+        self.level = min(self.level, -seconds * self.rate)
+
+
+class RateGovernor:
+    """
+    Requests-per-minute and tokens-per-minute budget shared by every OpenAI
+    call in this process.
+
+    acquire() takes one request and the estimated tokens from the buckets,
+    queueing callers in arrival order while the budget refills. A caller that
+    would wait longer than max_wait_seconds, or finds max_queue callers
+    already waiting, gets RateLimitExceeded straight away.
+    """
+
+    def __init__(self, rpm: int, tpm: int, max_wait_seconds: float, max_queue: int):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_wait_seconds = max_wait_seconds
+        self.max_queue = max_queue
+        self._turn = asyncio.Lock()
+        self.waiting = 0
+        self.admitted = 0
+        self.delayed = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+
+    def _reject(self, retry_after: float) -> RateLimitExceeded:
+        self.rejected += 1
+        logger.warning(f"OpenAI budget exhausted; rejecting call (retry after {retry_after:.1f}s)")
+        return RateLimitExceeded(retry_after)
+
+    async def acquire(self, estimated_tokens: int) -> None:
+        # A single call larger than the whole bucket would never fit
+        estimated_tokens = min(estimated_tokens, self.tokens.capacity)
+        if self.waiting >= self.max_queue:
+            raise self._reject(max(self.requests.wait_time(1), self.tokens.wait_time(estimated_tokens)))
+
+        started = time.monotonic()
+        deadline = started + self.max_wait_seconds
+        self.waiting += 1
+        try:
+            async with self._turn:
+                while True:
+                    wait = max(self.requests.wait_time(1), self.tokens.wait_time(estimated_tokens))
+                    if wait <= 0:
+                        break
+                    if time.monotonic() + wait > deadline:
+                        raise self._reject(wait)
+                    await asyncio.sleep(wait)
+                self.requests.take(1)
+                self.tokens.take(estimated_tokens)
+        finally:
+            self.waiting -= 1
+
+        waited = time.monotonic() - started
+        self.admitted += 1
+        if waited > 0.001:
+            self.delayed += 1
+            self.wait_seconds += waited
+
+    def settle(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """
+        Charge the difference when a call used more tokens than estimated.
+        Unused estimates are not refunded, since OpenAI counts max_tokens
+        against the limit too.
+        """
+        if actual_tokens > estimated_tokens:
+            self.tokens.take(actual_tokens - estimated_tokens)
+
+    def penalize(self, retry_after: float) -> None:
+        """Stop admitting calls for retry_after seconds after OpenAI answered 429."""
+        self.requests.drain(retry_after)
+        self.tokens.drain(retry_after)
+
+    def stats(self) -> dict:
+        return {
+            "rpm_limit": int(self.requests.capacity),
+            "tpm_limit": int(self.tokens.capacity),
+            "requests_available": int(self.requests.available()),
+            "tokens_available": int(self.tokens.available()),
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "delayed": self.delayed,
+            "rejected": self.rejected,
+            "avg_wait_seconds": round(self.wait_seconds / self.delayed, 3) if self.delayed else 0.0,
+        }
+
+
+governor = RateGovernor(OPENAI_RPM_LIMIT, OPENAI_TPM_LIMIT, RATE_LIMIT_MAX_WAIT_SECONDS, RATE_LIMIT_MAX_QUEUE)
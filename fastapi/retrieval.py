@@ -0,0 +1,144 @@
+import io
+import os
+import re
+from collections import Counter
+from typing import List, Tuple
+
+import numpy as np
+
+# Passage size for retrieval; small enough that top-k passages make a short prompt
+RETRIEVAL_CHUNK_CHARS = int(os.getenv("RETRIEVAL_CHUNK_CHARS", "1500"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "6"))
+
+# Bump when the on-disk layout or tokenization changes
+INDEX_VERSION = "bm25-1"
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# Longer runs are usually unsegmented scripts or noise; they would also widen
+# the fixed-width vocabulary array for every term
+_MAX_TOKEN_CHARS = 40
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if len(t) <= _MAX_TOKEN_CHARS]
+
+
+def chunk_spans(text: str, max_chars: int) -> List[Tuple[int, int]]:
+    """
+    Split text into (start, end) spans of at most max_chars, ending each span
+    at the last paragraph or line break when there is one.
+    """
+    spans = []
+    start = 0
+    length = len(text)
+    while start < length:
+        end = min(start + max_chars, length)
+        if end < length:
+            cut = text.rfind("\n\n", start, end)
+            if cut <= start:
+                cut = text.rfind("\n", start, end)
+            if cut > start:
+                end = cut
+        if text[start:end].strip():
+            spans.append((start, end))
+        start = end
+    return spans
+
+
+class BM25Index:
+    """
+    Okapi BM25 index over the passages of one document.
+
+    Postings are stored term-major in CSR form (indptr / doc_ids / tfs) next to
+    a sorted vocabulary, so a lookup is a searchsorted per query term plus a
+    few vectorized array operations. Passages are kept as character spans into
+    the extracted text rather than as copies of it.
+    """
+
+    def __init__(self, vocab, indptr, doc_ids, tfs, doc_lens, spans):
+        self.vocab = vocab
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_lens = doc_lens
+        self.spans = spans
+        n_docs = len(doc_lens)
+        df = np.diff(indptr).astype(np.float32)
+        self.idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        self.avg_len = float(doc_lens.mean()) if n_docs else 0.0
+
+    @classmethod
+    def build(cls, text: str, max_chars: int = RETRIEVAL_CHUNK_CHARS) -> "BM25Index":
+        spans = chunk_spans(text, max_chars)
+        counts = [Counter(tokenize(text[s:e])) for s, e in spans]
+
+        vocab = np.array(sorted({t for c in counts for t in c}), dtype=str)
+        term_index = {t: i for i, t in enumerate(vocab.tolist())}
+
+        postings = [[] for _ in range(len(vocab))]
+        for doc_id, c in enumerate(counts):
+            for term, tf in c.items():
+                postings[term_index[term]].append((doc_id, tf))
+
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(p) for p in postings])
+        doc_ids = np.fromiter((d for p in postings for d, _ in p), dtype=np.int32, count=int(indptr[-1]))
+        tfs = np.fromiter((tf for p in postings for _, tf in p), dtype=np.float32, count=int(indptr[-1]))
+        doc_lens = np.array([sum(c.values()) for c in counts], dtype=np.float32)
+        return cls(vocab, indptr, doc_ids, tfs, doc_lens, np.array(spans, dtype=np.int64).reshape(-1, 2))
+
+    def search(self, query: str, top_k: int = RETRIEVAL_TOP_K) -> List[int]:
+        """
+        Return the indices of the top_k passages for query, in document order.
+        """
+        n_docs = len(self.doc_lens)
+        if n_docs == 0:
+            return []
+        terms = np.array(sorted(set(tokenize(query))), dtype=str)
+        scores = np.zeros(n_docs, dtype=np.float32)
+        if len(terms) and len(self.vocab):
+            pos = np.searchsorted(self.vocab, terms)
+            found = pos < len(self.vocab)
+            pos, terms = pos[found], terms[found]
+            pos = pos[self.vocab[pos] == terms]
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lens / max(self.avg_len, 1.0))
+            for term_id in pos:
+                lo, hi = self.indptr[term_id], self.indptr[term_id + 1]
+                docs = self.doc_ids[lo:hi]
+                tf = self.tfs[lo:hi]
+                scores[docs] += self.idf[term_id] * tf * (BM25_K1 + 1) / (tf + norm[docs])
+
+        k = min(top_k, n_docs)
+        if not scores.any():
+            # Nothing matched; fall back to the start of the document
+            return list(range(k))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[scores[top] > 0]
+        return sorted(int(i) for i in top)
+
+    def passages(self, text: str, indices: List[int]) -> List[str]:
+        return [text[self.spans[i, 0]:self.spans[i, 1]].strip() for i in indices]
+
+    def to_bytes(self) -> bytes:
+        buf = io.BytesIO()
+        np.savez_compressed(
+            buf, vocab=self.vocab, indptr=self.indptr, doc_ids=self.doc_ids,
+            tfs=self.tfs, doc_lens=self.doc_lens, spans=self.spans,
+        )
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "BM25Index":
+        with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+            return cls(
+                arrays["vocab"], arrays["indptr"], arrays["doc_ids"],
+                arrays["tfs"], arrays["doc_lens"], arrays["spans"],
+            )
+
+
+def build_index_bytes(text: str) -> bytes:
+    """Build and serialize an index; module-level so it can run in the extraction pool."""
+    return BM25Index.build(text).to_bytes()
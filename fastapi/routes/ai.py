@@ -1,9 +1,19 @@
 # routes/ai.py
 from fastapi import APIRouter, HTTPException, Form, Depends, Request
-from fastapi.responses import JSONResponse
-from ai_utils import summarize_pdf, answer_question_about_pdf, generate_quiz_from_pdf
-from database import database
+from fastapi.responses import JSONResponse, StreamingResponse
+from ai_utils import (
+    summarize_pdf, summary_flights, answer_question_about_pdf, generate_quiz_from_pdf, generate_batch_quiz,
+    load_pdf_text, document_key, stream_summary, stream_answer_about_pdf, stream_quiz, validate_page_range,
+    QUIZ_MAX_CHARS, QUIZ_MAX_QUESTIONS_PER_FILE,
+)
+from database import adopt_stored_summary, database, get_pdf_file, get_stored_summary, save_pdf_summary
+from jobs import enqueue_job, get_job, serialize_job
+from question_bank import add_questions, quiz_from_bank, sample_questions
+from llm_client import OPENAI_MODEL, completion_flights, response_cache
+from pdf_text import parse_page_range
+from rate_limit import RateLimitExceeded, governor
 import os
+import json
 import logging
 
 from security import require_auth
@@ -11,10 +21,36 @@ from security import require_auth
 router = APIRouter(dependencies=[Depends(require_auth)])
 logger = logging.getLogger(__name__)
 
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def _sse(event: str, data: dict) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _parse_pages(pages: str | None):
+    try:
+        return parse_page_range(pages)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def _require_file_on_disk(file_id: int, page_range=None):
+    file_record = await get_pdf_file(file_id)
+    if not file_record:
+        raise HTTPException(status_code=404, detail="File not found")
+    if not os.path.exists(file_record["file_path"]):
+        raise HTTPException(status_code=404, detail="PDF file not found on disk")
+    try:
+        await validate_page_range(file_record["file_path"], page_range, file_record["page_count"])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return file_record
+
 @router.post("/ai/summarize")
 async def summarize_document(
     file_id: int = Form(...),
-    max_length: int = Form(500)
+    max_length: int = Form(500),
+    pages: str = Form(None),
+    regenerate: bool = Form(False)
 ):
     """
     Generate a summary for an uploaded PDF document.
@@ -22,41 +58,47 @@ async def summarize_document(
     Args:
         file_id: The ID of the PDF file in the database
         max_length: Maximum length of the summary in words (default: 500)
+        pages: Optional page range such as "41-60"; only those pages are
+            summarized and the stored document summary is left unchanged
+        regenerate: Generate a new summary even if one is already stored for
+            this file, length and model
     """
+    page_range = _parse_pages(pages)
     try:
-        # Get file information from database
-        query = "SELECT * FROM pdf_files WHERE id = :file_id"
-        file_record = await database.fetch_one(query=query, values={"file_id": file_id})
-        
-        if not file_record:
-            raise HTTPException(status_code=404, detail="File not found")
-        
+        file_record = await _require_file_on_disk(file_id, page_range)
         file_path = file_record["file_path"]
         
-        # Check if file exists on disk
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=404, detail="PDF file not found on disk")
+        # Serve the stored summary for this file, length and model if there is one
+        if page_range is None and not regenerate:
+            stored = await get_stored_summary(file_id, max_length, OPENAI_MODEL)
+            if stored:
+                await adopt_stored_summary(file_record, max_length, OPENAI_MODEL, stored)
+                return JSONResponse({
+                    "file_id": file_id,
+                    "file_name": file_record["name"],
+                    "pages": None,
+                    "summary": stored["summary"],
+                    "original_word_count": stored["source_word_count"],
+                    "summary_word_count": len(stored["summary"].split()),
+                    "cached": True,
+                    "success": True
+                })
         
         # Generate summary
-        result = await summarize_pdf(file_path, max_length)
+        result = await summarize_pdf(file_path, max_length, page_range, use_cache=not regenerate)
         
-        # Store summary in database (optional - you might want to cache summaries)
-        update_query = """
-        UPDATE pdf_files 
-        SET summary = :summary, summary_generated_at = NOW()
-        WHERE id = :file_id
-        """
-        await database.execute(
-            query=update_query, 
-            values={"summary": result["summary"], "file_id": file_id}
-        )
+        # Store summary in database
+        if page_range is None:
+            await save_pdf_summary(file_id, max_length, OPENAI_MODEL, result["summary"], result["word_count"])
         
         return JSONResponse({
             "file_id": file_id,
             "file_name": file_record["name"],
+            "pages": pages if page_range else None,
             "summary": result["summary"],
             "original_word_count": result["word_count"],
             "summary_word_count": result["summary_length"],
+            "cached": False,
             "success": True
         })
         
@@ -66,6 +108,92 @@ async def summarize_document(
         logger.error(f"Error summarizing document {file_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to generate summary: {str(e)}")
 
+@router.post("/ai/summarize/stream")
+async def summarize_document_stream(
+    file_id: int = Form(...),
+    max_length: int = Form(500),
+    pages: str = Form(None),
+    regenerate: bool = Form(False)
+):
+    """
+    Stream a summary for an uploaded PDF document as server-sent events.
+    
+    Emits `token` events with {"text": ...} as the model writes, then a single
+    `done` event with the same fields as /ai/summarize once the summary has
+    been stored, or an `error` event if generation fails. A stored summary is
+    sent as one `token` event unless regenerate is set.
+    
+    Args:
+        file_id: The ID of the PDF file in the database
+        max_length: Maximum length of the summary in words (default: 500)
+        pages: Optional page range such as "41-60"
+        regenerate: Generate a new summary even if one is already stored
+    """
+    page_range = _parse_pages(pages)
+    file_record = await _require_file_on_disk(file_id, page_range)
+    file_path = file_record["file_path"]
+    
+    stored = None
+    if page_range is None and not regenerate:
+        stored = await get_stored_summary(file_id, max_length, OPENAI_MODEL)
+        if stored:
+            await adopt_stored_summary(file_record, max_length, OPENAI_MODEL, stored)
+    
+    async def event_stream():
+        try:
+            if stored:
+                yield _sse("token", {"text": stored["summary"]})
+                yield _sse("done", {
+                    "file_id": file_id,
+                    "file_name": file_record["name"],
+                    "pages": None,
+                    "summary": stored["summary"],
+                    "original_word_count": stored["source_word_count"],
+                    "summary_word_count": len(stored["summary"].split()),
+                    "cached": True,
+                    "success": True
+                })
+                return
+            
+            extracted_text = await load_pdf_text(file_path, page_range)
+            if not extracted_text.strip():
+                raise Exception("No text could be extracted from the PDF")
+            
+            parts = []
+            tokens = await stream_summary(
+                extracted_text, max_length, await document_key(file_path, page_range),
+                use_cache=not regenerate
+            )
+            try:
+                async for token in tokens:
+                    parts.append(token)
+                    yield _sse("token", {"text": token})
+            finally:
+                await tokens.aclose()
+            
+            summary = "".join(parts).strip()
+            word_count = len(extracted_text.split())
+            if page_range is None:
+                await save_pdf_summary(file_id, max_length, OPENAI_MODEL, summary, word_count)
+            
+            yield _sse("done", {
+                "file_id": file_id,
+                "file_name": file_record["name"],
+                "pages": pages if page_range else None,
+                "summary": summary,
+                "original_word_count": word_count,
+                "summary_word_count": len(summary.split()),
+                "cached": False,
+                "success": True
+            })
+        except RateLimitExceeded as e:
+            yield _sse("error", {"detail": e.detail, "retry_after": e.retry_after})
+        except Exception as e:
+            logger.error(f"Error streaming summary for document {file_id}: {str(e)}")
+            yield _sse("error", {"detail": f"Failed to generate summary: {str(e)}"})
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @router.get("/ai/summary/{file_id}")
 async def get_summary(file_id: int):
     """
@@ -100,7 +228,9 @@ async def get_summary(file_id: int):
 @router.post("/ai/chat")
 async def chat_with_pdf(
     file_id: int = Form(...),
-    question: str = Form(...)
+    question: str = Form(...),
+    pages: str = Form(None),
+    regenerate: bool = Form(False)
 ):
     """
     Answer a question about a PDF document using AI.
@@ -108,23 +238,16 @@ async def chat_with_pdf(
     Args:
         file_id: The ID of the PDF file in the database
         question: The question to ask about the PDF content
+        pages: Optional page range such as "41-60" to answer from
+        regenerate: Skip cached model responses and generate a fresh answer
     """
+    page_range = _parse_pages(pages)
     try:
-        # Get file information from database
-        query = "SELECT * FROM pdf_files WHERE id = :file_id"
-        file_record = await database.fetch_one(query=query, values={"file_id": file_id})
-        
-        if not file_record:
-            raise HTTPException(status_code=404, detail="File not found")
-        
+        file_record = await _require_file_on_disk(file_id, page_range)
         file_path = file_record["file_path"]
         
-        # Check if file exists on disk
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=404, detail="PDF file not found on disk")
-        
         # Generate answer using AI
-        answer = await answer_question_about_pdf(file_path, question)
+        answer = await answer_question_about_pdf(file_path, question, page_range, use_cache=not regenerate)
         
         return JSONResponse({
             "file_id": file_id,
@@ -140,14 +263,86 @@ async def chat_with_pdf(
         logger.error(f"Error answering question for document {file_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to answer question: {str(e)}")
 
+@router.post("/ai/chat/stream")
+async def chat_with_pdf_stream(
+    request: Request,
+    file_id: int = Form(...),
+    question: str = Form(...),
+    pages: str = Form(None),
+    regenerate: bool = Form(False)
+):
+    """
+    Stream an answer to a question about a PDF document as server-sent events.
+    
+    Emits `token` events with {"text": ...}, then `done` with the full answer
+    (or `error`). If the client goes away mid-answer the upstream OpenAI
+    request is closed so no more tokens are generated.
+    
+    Args:
+        file_id: The ID of the PDF file in the database
+        question: The question to ask about the PDF content
+        pages: Optional page range such as "41-60" to answer from
+        regenerate: Skip cached model responses and generate a fresh answer
+    """
+    page_range = _parse_pages(pages)
+    file_record = await _require_file_on_disk(file_id, page_range)
+    file_path = file_record["file_path"]
+    
+    async def event_stream():
+        try:
+            tokens = await stream_answer_about_pdf(file_path, question, page_range, use_cache=not regenerate)
+            parts = []
+            try:
+                async for token in tokens:
+                    if await request.is_disconnected():
+                        logger.info(f"Client disconnected during chat on document {file_id}; cancelling")
+                        return
+                    parts.append(token)
+                    yield _sse("token", {"text": token})
+            finally:
+                await tokens.aclose()
+            
+            yield _sse("done", {
+                "file_id": file_id,
+                "file_name": file_record["name"],
+                "question": question,
+                "answer": "".join(parts).strip(),
+                "success": True
+            })
+        except RateLimitExceeded as e:
+            yield _sse("error", {"detail": e.detail, "retry_after": e.retry_after})
+        except Exception as e:
+            logger.error(f"Error streaming answer for document {file_id}: {str(e)}")
+            yield _sse("error", {"detail": f"Failed to answer question: {str(e)}"})
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.get("/ai/stats")
+async def get_ai_stats():
+    """
+    Report counters for the AI layer: LLM response cache hits and misses, the
+    OpenAI request/token budget, and how many completion and summary requests
+    joined an identical call already in flight instead of starting their own.
+    """
+    return JSONResponse({
+        "llm_cache": response_cache.stats(),
+        "rate_limit": governor.stats(),
+        "coalescing": {
+            "completions": completion_flights.stats(),
+            "summaries": summary_flights.stats()
+        }
+    })
+
 @router.get("/ai/user-summaries/{user_id}")
 async def get_user_summaries(user_id: int, limit: int = 20):
     """
     Get all summaries for a user to populate the summary history.
     """
     try:
+        # Key points and word counts are computed when the summary is saved
         query = """
-        SELECT id, name, file_path, uploaded_at, summary, summary_generated_at
+        SELECT id, name, uploaded_at, summary, summary_generated_at,
+               summary_key_points, summary_word_count
         FROM pdf_files 
         WHERE user_id = :user_id AND summary IS NOT NULL
         ORDER BY summary_generated_at DESC 
@@ -160,10 +355,7 @@ async def get_user_summaries(user_id: int, limit: int = 20):
         
         summaries = []
         for file in files:
-            # Parse summary into key points (split by newlines or sentences)
-            import re
-            key_points = re.split(r'\n|\. ', file["summary"]) if file["summary"] else []
-            key_points = [re.sub(r'^\d+\.\s*', '', point.strip()) for point in key_points if point.strip() and len(point.strip()) > 10][:8]
+            key_points = json.loads(file["summary_key_points"]) if file["summary_key_points"] else []
             
             summaries.append({
                 "id": f"sum-{file['id']}-{int(file['summary_generated_at'].timestamp()) if file['summary_generated_at'] else int(file['uploaded_at'].timestamp())}",
@@ -172,7 +364,7 @@ async def get_user_summaries(user_id: int, limit: int = 20):
                 "createdAt": file["summary_generated_at"].isoformat() if file["summary_generated_at"] else file["uploaded_at"].isoformat(),
                 "content": file["summary"],
                 "keyPoints": key_points if key_points else ["Summary generated successfully"],
-                "wordCount": len(file["summary"].split()) if file["summary"] else 0,
+                "wordCount": file["summary_word_count"] or 0,
                 "fileId": file["id"]
             })
         
@@ -221,7 +413,9 @@ async def get_files_with_summaries(user_id: int, limit: int = 10):
 async def generate_quiz(
     file_id: int = Form(...),
     num_questions: int = Form(5),
-    difficulty: str = Form("medium")
+    difficulty: str = Form("medium"),
+    pages: str = Form(None),
+    regenerate: bool = Form(False)
 ):
     """
     Generate a quiz for an uploaded PDF document.
@@ -230,7 +424,10 @@ async def generate_quiz(
         file_id: The ID of the PDF file in the database
         num_questions: Number of questions to generate (default: 5)
         difficulty: Difficulty level - easy, medium, or hard (default: medium)
+        pages: Optional page range such as "41-60" to draw questions from
+        regenerate: Skip cached model responses and generate a new quiz
     """
+    page_range = _parse_pages(pages)
     try:
         # Validate difficulty level
         if difficulty not in ["easy", "medium", "hard"]:
@@ -240,21 +437,19 @@ async def generate_quiz(
         if num_questions < 1 or num_questions > 20:
             raise HTTPException(status_code=400, detail="Number of questions must be between 1 and 20")
         
-        # Get file information from database
-        query = "SELECT * FROM pdf_files WHERE id = :file_id"
-        file_record = await database.fetch_one(query=query, values={"file_id": file_id})
-        
-        if not file_record:
-            raise HTTPException(status_code=404, detail="File not found")
-        
+        file_record = await _require_file_on_disk(file_id, page_range)
         file_path = file_record["file_path"]
         
-        # Check if file exists on disk
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=404, detail="PDF file not found on disk")
-        
-        # Generate quiz
-        result = await generate_quiz_from_pdf(file_path, num_questions, difficulty)
+        # Generate quiz; whole-file quizzes reuse questions from the bank
+        if page_range is None:
+            result = await quiz_from_bank(
+                file_id, file_path, num_questions, difficulty,
+                use_cache=not regenerate, word_count=file_record["word_count"]
+            )
+        else:
+            result = await generate_quiz_from_pdf(
+                file_path, num_questions, difficulty, page_range, use_cache=not regenerate
+            )
         
         return JSONResponse({
             "file_id": file_id,
@@ -263,7 +458,8 @@ async def generate_quiz(
             "metadata": {
                 "source_word_count": result["source_word_count"],
                 "num_questions": result["num_questions"],
-                "difficulty": result["difficulty"]
+                "difficulty": result["difficulty"],
+                "banked_questions": result.get("banked_questions", 0)
             },
             "success": True
         })
@@ -274,6 +470,243 @@ async def generate_quiz(
         logger.error(f"Error generating quiz for document {file_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to generate quiz: {str(e)}")
 
+@router.post("/ai/generate-quiz/stream")
+async def generate_quiz_stream(
+    request: Request,
+    file_id: int = Form(...),
+    num_questions: int = Form(5),
+    difficulty: str = Form("medium"),
+    pages: str = Form(None),
+    regenerate: bool = Form(False)
+):
+    """
+    Generate a quiz for a PDF document, streaming questions as server-sent events.
+    
+    Emits a `question` event with {"index": ..., "question": ...} as soon as
+    each question has been generated and validated, then `done` with the full
+    quiz (or `error`). Questions that come back malformed are regenerated, so
+    `done` may arrive with fewer questions than requested only if retries also
+    fail. Whole-file quizzes start with questions from the file's question
+    bank and only generate the rest.
+    
+    Args:
+        file_id: The ID of the PDF file in the database
+        num_questions: Number of questions to generate (default: 5)
+        difficulty: Difficulty level - easy, medium, or hard (default: medium)
+        pages: Optional page range such as "41-60" to draw questions from
+        regenerate: Skip cached model responses and generate a new quiz
+    """
+    page_range = _parse_pages(pages)
+    if difficulty not in ["easy", "medium", "hard"]:
+        raise HTTPException(status_code=400, detail="Difficulty must be 'easy', 'medium', or 'hard'")
+    if num_questions < 1 or num_questions > 20:
+        raise HTTPException(status_code=400, detail="Number of questions must be between 1 and 20")
+    
+    file_record = await _require_file_on_disk(file_id, page_range)
+    file_path = file_record["file_path"]
+    
+    async def event_stream():
+        try:
+            text = await load_pdf_text(file_path, page_range, max_chars=QUIZ_MAX_CHARS)
+            if not text.strip():
+                raise Exception("No text could be extracted from the PDF")
+            
+            use_bank = page_range is None
+            banked = await sample_questions(file_id, difficulty, num_questions) if use_bank and not regenerate else []
+            questions = []
+            for question in banked:
+                questions.append(question)
+                yield _sse("question", {"index": len(questions) - 1, "question": question})
+            
+            if len(questions) < num_questions:
+                stream = stream_quiz(
+                    text, num_questions - len(questions), difficulty, use_cache=not regenerate,
+                    avoid=[q["question"] for q in banked]
+                )
+                try:
+                    async for question in stream:
+                        if await request.is_disconnected():
+                            logger.info(f"Client disconnected during quiz on document {file_id}; cancelling")
+                            return
+                        questions.append(question)
+                        yield _sse("question", {"index": len(questions) - 1, "question": question})
+                finally:
+                    await stream.aclose()
+                if use_bank:
+                    try:
+                        await add_questions(file_id, difficulty, questions[len(banked):])
+                    except Exception as e:
+                        logger.warning(f"Could not add questions to the bank for file {file_id}: {str(e)}")
+            
+            yield _sse("done", {
+                "file_id": file_id,
+                "file_name": file_record["name"],
+                "quiz": {
+                    "quiz_title": "Quiz based on document content",
+                    "questions": questions
+                },
+                "metadata": {
+                    "source_word_count": len(text.split()),
+                    "num_questions": len(questions),
+                    "difficulty": difficulty,
+                    "banked_questions": len(banked)
+                },
+                "success": True
+            })
+        except RateLimitExceeded as e:
+            yield _sse("error", {"detail": e.detail, "retry_after": e.retry_after})
+        except Exception as e:
+            logger.error(f"Error streaming quiz for document {file_id}: {str(e)}")
+            yield _sse("error", {"detail": f"Failed to generate quiz: {str(e)}"})
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.post("/ai/generate-quiz/batch")
+async def generate_batch_quiz_endpoint(
+    file_ids: str = Form(...),
+    total_questions: int = Form(10),
+    difficulty: str = Form("medium"),
+    regenerate: bool = Form(False)
+):
+    """
+    Generate one merged, deduplicated quiz from several PDF documents.
+    
+    Args:
+        file_ids: Comma-separated IDs of the PDF files, e.g. "3,7,12" (max 10)
+        total_questions: Number of questions in the merged quiz (1-50, and at
+            most 20 per file)
+        difficulty: Difficulty level - easy, medium, or hard (default: medium)
+        regenerate: Skip cached model responses and generate new questions
+    """
+    try:
+        ids = list(dict.fromkeys(int(i) for i in file_ids.split(",") if i.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="file_ids must be a comma-separated list of integers")
+    if not 1 <= len(ids) <= 10:
+        raise HTTPException(status_code=400, detail="Select between 1 and 10 files")
+    if difficulty not in ["easy", "medium", "hard"]:
+        raise HTTPException(status_code=400, detail="Difficulty must be 'easy', 'medium', or 'hard'")
+    if total_questions < 1 or total_questions > 50:
+        raise HTTPException(status_code=400, detail="Number of questions must be between 1 and 50")
+    if total_questions > QUIZ_MAX_QUESTIONS_PER_FILE * len(ids):
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {QUIZ_MAX_QUESTIONS_PER_FILE} questions per file: select more files or ask for at most {QUIZ_MAX_QUESTIONS_PER_FILE * len(ids)}"
+        )
+    
+    try:
+        query = "SELECT id, name, file_path, word_count FROM pdf_files WHERE id = ANY(:ids)"
+        records = {r["id"]: r for r in await database.fetch_all(query=query, values={"ids": ids})}
+        
+        missing = [i for i in ids if i not in records or not os.path.exists(records[i]["file_path"])]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Files not found: {', '.join(map(str, missing))}")
+        
+        files = [
+            {"id": i, "name": records[i]["name"], "file_path": records[i]["file_path"], "word_count": records[i]["word_count"]}
+            for i in ids
+        ]
+        
+        async def from_bank(file: dict, num_questions: int, difficulty: str, use_cache: bool):
+            return await quiz_from_bank(
+                file["id"], file["file_path"], num_questions, difficulty, use_cache, file["word_count"]
+            )
+        
+        result = await generate_batch_quiz(
+            files, total_questions, difficulty, use_cache=not regenerate, quiz_source=from_bank
+        )
+        
+        return JSONResponse({
+            "file_ids": ids,
+            "quiz": result["quiz"],
+            "sources": result["sources"],
+            "metadata": {
+                "num_questions": result["num_questions"],
+                "difficulty": result["difficulty"]
+            },
+            "success": True
+        })
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error generating batch quiz for documents {ids}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to generate quiz: {str(e)}")
+
+def _job_accepted(job_id: int) -> JSONResponse:
+    return JSONResponse(
+        {"job_id": job_id, "status": "queued", "status_url": f"/api/ai/jobs/{job_id}"},
+        status_code=202
+    )
+
+@router.post("/ai/jobs/summarize")
+async def submit_summarize_job(
+    file_id: int = Form(...),
+    max_length: int = Form(500),
+    pages: str = Form(None),
+    regenerate: bool = Form(False),
+    user=Depends(require_auth)
+):
+    """
+    Queue a summary for the AI worker and return its job id (202 Accepted).
+    Poll /ai/jobs/{job_id} for progress and the result, which has the same
+    fields as /ai/summarize.
+    """
+    await _require_file_on_disk(file_id, _parse_pages(pages))
+    try:
+        job_id = await enqueue_job(
+            "summarize",
+            {"file_id": file_id, "max_length": max_length, "pages": pages, "regenerate": regenerate},
+            user_id=int(user["sub"])
+        )
+        return _job_accepted(job_id)
+    except Exception as e:
+        logger.error(f"Error queueing summary for document {file_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to queue summary: {str(e)}")
+
+@router.post("/ai/jobs/generate-quiz")
+async def submit_quiz_job(
+    file_id: int = Form(...),
+    num_questions: int = Form(5),
+    difficulty: str = Form("medium"),
+    pages: str = Form(None),
+    regenerate: bool = Form(False),
+    user=Depends(require_auth)
+):
+    """
+    Queue quiz generation for the AI worker and return its job id (202 Accepted).
+    The finished job's result has the same fields as /ai/generate-quiz.
+    """
+    if difficulty not in ["easy", "medium", "hard"]:
+        raise HTTPException(status_code=400, detail="Difficulty must be 'easy', 'medium', or 'hard'")
+    if num_questions < 1 or num_questions > 20:
+        raise HTTPException(status_code=400, detail="Number of questions must be between 1 and 20")
+    await _require_file_on_disk(file_id, _parse_pages(pages))
+    try:
+        job_id = await enqueue_job(
+            "generate_quiz",
+            {
+                "file_id": file_id, "num_questions": num_questions, "difficulty": difficulty,
+                "pages": pages, "regenerate": regenerate
+            },
+            user_id=int(user["sub"])
+        )
+        return _job_accepted(job_id)
+    except Exception as e:
+        logger.error(f"Error queueing quiz for document {file_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to queue quiz: {str(e)}")
+
+@router.get("/ai/jobs/{job_id}")
+async def get_job_status(job_id: int, user=Depends(require_auth)):
+    """
+    Report the status (queued, running, succeeded, failed), progress and, once
+    finished, the result or error of an AI job.
+    """
+    job = await get_job(job_id)
+    if not job or job["user_id"] != int(user["sub"]):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JSONResponse(serialize_job(job))
+
 @router.get("/ai/files-for-quiz/{user_id}")
 async def get_files_for_quiz(user_id: int, limit: int = 10):
     """
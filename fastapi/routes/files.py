@@ -1,17 +1,59 @@
 # routes/files.py
 from fastapi import APIRouter, UploadFile, Form, HTTPException, Depends, Request
-from fastapi.responses import JSONResponse
-import os, uuid, shutil
-from datetime import datetime
-from database import insert_pdf, get_recent_pdfs
+from fastapi.responses import FileResponse, JSONResponse, Response
+from starlette.requests import ClientDisconnect
+import os
+import asyncio
+from blob_store import store_staged_file, store_upload
+from database import copy_ingest_result_from_twin, get_pdf_file, insert_pdf, get_recent_pdfs
+from doc_cache import file_sha256
+from jobs import enqueue_job
+from upload_store import MAX_UPLOAD_BYTES, UPLOAD_DIR, NotAPdf, UploadTooLarge
+from upload_sessions import (
+    UploadOffsetMismatch, append_chunk, begin_finalize, create_upload_session,
+    delete_upload_session, get_upload_session, has_pdf_header, mark_upload_finalized,
+)
+import logging
 
 from security import require_auth
 
 router = APIRouter(dependencies=[Depends(require_auth)])
+logger = logging.getLogger(__name__)
 
-UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# The bytes behind a file id never change, so browsers may keep them for a year
+CONTENT_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+
+async def _add_stored_pdf(user_id: int, name: str, stored: dict) -> dict:
+    """Insert the pdf_files row for a file in the blob store and get it ingested."""
+    record = await insert_pdf(user_id, name, stored["file_path"], stored["content_sha256"], stored["size_bytes"])
+
+    # same content as an ingested file: its text and indexes are already cached
+    ingest_status = "pending"
+    if stored["deduplicated"] and await copy_ingest_result_from_twin(record["id"], stored["content_sha256"]):
+        ingest_status = "ready"
+    else:
+        # extract text, count pages and build search structures in the background
+        try:
+            await enqueue_job("ingest", {"file_id": record["id"]}, user_id=user_id)
+        except Exception as e:
+            logger.warning(f"Could not queue ingestion for file {record['id']}: {str(e)}")
+
+    return {
+        "id": record["id"],
+        "user_id": record["user_id"],
+        "name": record["name"],
+        "file_path": record["file_path"],
+        "uploaded_at": record["uploaded_at"].isoformat(),
+        "content_sha256": record["content_sha256"],
+        "size_bytes": record["size_bytes"],
+        "deduplicated": stored["deduplicated"],
+        "ingest_status": ingest_status,
+    }
+
+
 @router.post("/files/upload")
 async def upload_file(
     user_id: int = Form(...),
@@ -23,24 +65,142 @@ async def upload_file(
     if file.content_type != "application/pdf":
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
 
-    # unique filename
-    unique_name = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex}.pdf"
-    save_path = os.path.join(UPLOAD_DIR, unique_name)
-
-    # write file to disk
-    with open(save_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # write file to disk in chunks, hashing and checking it on the way; a
+    # file whose content is already stored is not written again
+    try:
+        stored = await store_upload(file)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except NotAPdf as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     # store record in DB
-    record = await insert_pdf(user_id, name, save_path)
+    return JSONResponse(await _add_stored_pdf(user_id, name, stored))
 
-    return JSONResponse({
-        "id": record["id"],
-        "user_id": record["user_id"],
-        "name": record["name"],
-        "file_path": record["file_path"],
-        "uploaded_at": record["uploaded_at"].isoformat(),
-    })
+
+# --- Resumable uploads --------------------------------------------------------
+# POST /files/uploads creates a session for a file of known size, PATCH
+# appends the request body at ?offset=, GET reports the offset to resume
+# from, and POST .../finalize turns the complete file into a pdf_files row.
+
+def _serialize_upload_session(session) -> dict:
+    return {
+        "upload_id": session["id"],
+        "name": session["name"],
+        "size": session["total_bytes"],
+        "offset": session["received_bytes"],
+        "status": session["status"],
+        "file_id": session["file_id"],
+    }
+
+
+async def _owned_upload_session(upload_id: str, user):
+    session = await get_upload_session(upload_id)
+    if not session or session["user_id"] != int(user["sub"]):
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return session
+
+
+@router.post("/files/uploads", status_code=201)
+async def create_upload(name: str = Form(...), size: int = Form(...), user=Depends(require_auth)):
+    if size <= 0:
+        raise HTTPException(status_code=400, detail="Upload size must be positive")
+    if size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"File is larger than {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+    session = await create_upload_session(int(user["sub"]), name, size)
+    return _serialize_upload_session(session)
+
+
+@router.get("/files/uploads/{upload_id}")
+async def upload_status(upload_id: str, user=Depends(require_auth)):
+    return _serialize_upload_session(await _owned_upload_session(upload_id, user))
+
+
+@router.patch("/files/uploads/{upload_id}")
+async def append_upload(upload_id: str, offset: int, request: Request, user=Depends(require_auth)):
+    """
+    Append the raw request body to an upload, starting at offset. A
+    mismatched offset gets 409 with the offset to resume from.
+    """
+    session = await _owned_upload_session(upload_id, user)
+    if session["status"] != "open":
+        raise HTTPException(status_code=409, detail=f"Upload is {session['status']}")
+    try:
+        new_offset = await append_chunk(session, offset, request.stream())
+    except UploadOffsetMismatch as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Upload-Offset": str(e.offset)})
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ClientDisconnect:
+        # What arrived is recorded; the client asks for the offset when it is back
+        logger.info(f"Client disconnected during upload {upload_id}")
+        return Response(status_code=499)
+    return {"upload_id": upload_id, "offset": new_offset, "size": session["total_bytes"]}
+
+
+@router.post("/files/uploads/{upload_id}/finalize")
+async def finalize_upload(upload_id: str, user=Depends(require_auth)):
+    session = await _owned_upload_session(upload_id, user)
+    if session["status"] == "finalized" and session["file_id"]:
+        # A retried finalize whose first response was lost
+        record = await get_pdf_file(session["file_id"])
+        return {
+            "id": record["id"],
+            "user_id": record["user_id"],
+            "name": record["name"],
+            "file_path": record["file_path"],
+            "uploaded_at": record["uploaded_at"].isoformat(),
+            "content_sha256": record["content_sha256"],
+            "size_bytes": record["size_bytes"],
+            "ingest_status": record["ingest_status"],
+        }
+
+    claimed = await begin_finalize(upload_id)
+    if not claimed:
+        if session["received_bytes"] < session["total_bytes"]:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Upload is incomplete ({session['received_bytes']} of {session['total_bytes']} bytes)",
+                headers={"Upload-Offset": str(session["received_bytes"])},
+            )
+        raise HTTPException(status_code=409, detail="Upload is already being finalized")
+
+    path = claimed["staging_path"]
+    if not await asyncio.to_thread(has_pdf_header, path):
+        await delete_upload_session(claimed)
+        raise HTTPException(status_code=400, detail="File is not a PDF")
+    try:
+        digest = await asyncio.to_thread(file_sha256, path)
+        stored = await store_staged_file(path, digest, claimed["total_bytes"])
+    except Exception as e:
+        # The staged file is gone or unusable; the client has to start over
+        logger.error(f"Could not store upload {upload_id}: {str(e)}")
+        await _discard_upload_session(claimed)
+        raise HTTPException(status_code=500, detail="Failed to store upload")
+
+    try:
+        result = await _add_stored_pdf(claimed["user_id"], claimed["name"], stored)
+    except Exception as e:
+        # The staged file is already in the blob store (collected later if
+        # unused), so the session cannot be finalized again
+        logger.error(f"Could not add upload {upload_id} as a file: {str(e)}")
+        await _discard_upload_session(claimed)
+        raise HTTPException(status_code=500, detail="Failed to store upload")
+    try:
+        await mark_upload_finalized(upload_id, result["id"])
+    except Exception as e:
+        # The file exists; drop the session rather than leave it finalizing
+        logger.error(f"Could not mark upload {upload_id} finalized: {str(e)}")
+        await _discard_upload_session(claimed)
+    return JSONResponse(result)
+
+
+async def _discard_upload_session(session) -> None:
+    try:
+        await delete_upload_session(session)
+    except Exception as e:
+        # Left for collect_abandoned_upload_sessions
+        logger.error(f"Could not delete upload session {session['id']}: {str(e)}")
 
 
 @router.get("/files/recent/{user_id}")
@@ -54,3 +214,43 @@ async def recent_files(user_id: int, limit: int = 10):
         }
         for r in rows
     ]
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+@router.get("/files/{file_id}/content")
+async def file_content(file_id: int, request: Request, user=Depends(require_auth)):
+    """
+    Serve a PDF to its owner.
+
+    The ETag is the file's SHA-256, so a browser revalidating with
+    If-None-Match gets 304 without the body. Range requests are answered
+    with 206 and only the requested bytes, which lets PDF viewers load pages
+    on demand. FileResponse hands the file to the server with
+    http.response.pathsend (sendfile) when the server supports it.
+    """
+    record = await get_pdf_file(file_id)
+    if not record or record["user_id"] != int(user["sub"]):
+        raise HTTPException(status_code=404, detail="File not found")
+    path = record["file_path"]
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="PDF file not found on disk")
+
+    digest = record["content_sha256"] or await asyncio.to_thread(file_sha256, path)
+    headers = {"ETag": f'"{digest}"', "Cache-Control": CONTENT_CACHE_CONTROL}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    filename = record["name"] if record["name"].lower().endswith(".pdf") else f"{record['name']}.pdf"
+    return FileResponse(
+        path,
+        media_type="application/pdf",
+        headers=headers,
+        filename=filename,
+        content_disposition_type="inline",
+    )
@@ -0,0 +1,45 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one execution.
+
+    The first caller for a key starts fn() as a task; callers arriving while it
+    runs await the same task and get the same result or exception. The task is
+    shielded, so a caller that is cancelled (e.g. its client disconnected)
+    does not cancel the work the others are waiting for.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._tasks.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.executed += 1
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # Mark the exception as retrieved when every caller has gone away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        calls = self.executed + self.coalesced
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round(self.coalesced / calls, 3) if calls else 0.0,
+            "in_flight": len(self._tasks),
+        }
@@ -0,0 +1,149 @@
+import os
+import json
+import asyncio
+import logging
+from typing import List, Optional
+
+from context_packing import SUMMARY_CONTEXT_TOKENS, chars_for_tokens, estimate_tokens, fit_text
+from doc_cache import DocumentCache
+from llm_client import OPENAI_MODEL, chat_completion
+
+logger = logging.getLogger(__name__)
+
+# Size of one section sent to the map step, and of the largest set of notes
+# the final reduce prompt may contain
+SUMMARY_CHUNK_TOKENS = SUMMARY_CONTEXT_TOKENS
+SUMMARY_MAP_CONCURRENCY = int(os.getenv("SUMMARY_MAP_CONCURRENCY", "4"))
+SECTION_SUMMARY_MAX_TOKENS = 400
+
+section_cache = DocumentCache(
+    "section_summaries", int(os.getenv("SECTION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+)
+
+SECTION_SYSTEM_PROMPT = "You are a helpful assistant that writes dense, factual notes on sections of academic and professional documents."
+
+
+def needs_map_reduce(text: str) -> bool:
+    """True when text is too long to summarize in a single prompt."""
+    return estimate_tokens(text, OPENAI_MODEL) > SUMMARY_CHUNK_TOKENS
+
+
+def split_into_chunks(text: str, max_chars: int) -> List[str]:
+    """
+    Split text into chunks of at most max_chars, breaking on line boundaries
+    where possible.
+    """
+    chunks = []
+    current = []
+    current_len = 0
+    for line in text.splitlines(keepends=True):
+        while len(line) > max_chars:
+            if current:
+                chunks.append("".join(current))
+                current, current_len = [], 0
+            chunks.append(line[:max_chars])
+            line = line[max_chars:]
+        if current_len + len(line) > max_chars and current:
+            chunks.append("".join(current))
+            current, current_len = [], 0
+        current.append(line)
+        current_len += len(line)
+    if current:
+        chunks.append("".join(current))
+    return [c for c in (chunk.strip() for chunk in chunks) if c]
+
+
+async def _summarize_section(section: str, part: int, total: int) -> str:
+    prompt = f"""
+    The following is part {part} of {total} of a longer document.
+    Write concise notes (about 200 words) covering its main points, key concepts, definitions and important details.
+
+    Section text:
+    {section}
+
+    Notes:
+    """
+    notes = await chat_completion(
+        messages=[
+            {"role": "system", "content": SECTION_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=SECTION_SUMMARY_MAX_TOKENS,
+        temperature=0.3
+    )
+    return notes.strip()
+
+
+async def _map_sections(sections: List[str]) -> List[str]:
+    slots = asyncio.Semaphore(SUMMARY_MAP_CONCURRENCY)
+
+    async def run(index: int, section: str) -> str:
+        async with slots:
+            return await _summarize_section(section, index + 1, len(sections))
+
+    return list(await asyncio.gather(*(run(i, s) for i, s in enumerate(sections))))
+
+
+async def condensed_section_summaries(text: str, cache_key: Optional[str] = None) -> List[str]:
+    """
+    Reduce a long document to a list of section notes that fits in one prompt.
+
+    Sections are summarized concurrently (map), then groups of notes are
+    summarized again until the whole list fits in SUMMARY_CHUNK_TOKENS
+    (hierarchical reduce). The result does not depend on the requested summary
+    length, so it is cached under cache_key and reused by later requests.
+
+    Args:
+        text (str): Full document text
+        cache_key (str): Identifies the document, e.g. its SHA-256 and
+            extractor version; None disables caching
+
+    Returns:
+        list: Section notes in document order
+    """
+    key = f"{cache_key}-{OPENAI_MODEL}-{SUMMARY_CHUNK_TOKENS}" if cache_key else None
+    if key:
+        cached = await asyncio.to_thread(section_cache.get_text, key)
+        if cached is not None:
+            return json.loads(cached)
+
+    # Chunk by characters, using this document's own characters-per-token
+    # ratio so that non-Latin text gets proportionally smaller chunks
+    sections = split_into_chunks(text, chars_for_tokens(text, SUMMARY_CHUNK_TOKENS, OPENAI_MODEL))
+    logger.info(f"Summarizing {len(sections)} sections of {len(text)} characters")
+    notes = await _map_sections(sections)
+
+    while estimate_tokens("\n\n".join(notes), OPENAI_MODEL) > SUMMARY_CHUNK_TOKENS and len(notes) > 1:
+        joined = "\n\n".join(notes)
+        groups = split_into_chunks(joined, chars_for_tokens(joined, SUMMARY_CHUNK_TOKENS, OPENAI_MODEL))
+        if len(groups) >= len(notes):
+            # Individual notes are too long to group; keep what fits
+            break
+        notes = await _map_sections(groups)
+
+    if key:
+        try:
+            await asyncio.to_thread(section_cache.put_text, key, json.dumps(notes))
+        except OSError as e:
+            logger.warning(f"Could not cache section summaries: {str(e)}")
+    return notes
+
+
+def combine_messages(notes: List[str], max_length: int) -> list:
+    """Build the final reduce prompt that merges section notes into one summary."""
+    joined = "\n\n".join(f"Section {i + 1}:\n{n}" for i, n in enumerate(notes))
+    joined = fit_text(joined, SUMMARY_CHUNK_TOKENS, OPENAI_MODEL)
+    prompt = f"""
+    The following are notes on consecutive sections of one document.
+    Please combine them into a comprehensive summary of the whole document.
+    The summary should be approximately {max_length} words and should capture the main points, key concepts, and important details.
+
+    Section notes:
+    {joined}
+
+    Summary:
+    """
+    return [
+        {"role": "system", "content": "You are a helpful assistant that creates concise and informative summaries of academic and professional documents."},
+        {"role": "user", "content": prompt}
+    ]
@@ -0,0 +1,57 @@
+import io
+import os
+import asyncio
+
+import pytest
+from fastapi import UploadFile
+
+import blob_store
+
+PDF = b"%PDF-1.7\n" + b"x" * 5000
+
+
+@pytest.fixture
+def registered(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("uploads")
+    known = set()
+
+    async def register_blob(content_sha256, file_path, size_bytes):
+        new = content_sha256 not in known
+        known.add(content_sha256)
+        return new
+
+    monkeypatch.setattr(blob_store, "register_blob", register_blob)
+    return known
+
+
+def upload_files():
+    return sorted(os.listdir("uploads"))
+
+
+def test_first_upload_is_written_to_its_blob_path(registered):
+    stored = asyncio.run(blob_store.store_upload(UploadFile(file=io.BytesIO(PDF), filename="a.pdf")))
+    assert stored["deduplicated"] is False
+    with open(stored["file_path"], "rb") as f:
+        assert f.read() == PDF
+    assert upload_files() == ["blobs"]
+
+
+def test_repeat_upload_is_not_written(registered, monkeypatch):
+    first = asyncio.run(blob_store.store_upload(UploadFile(file=io.BytesIO(PDF), filename="a.pdf")))
+
+    async def no_write(upload, dest_path):
+        raise AssertionError("a stored blob was written again")
+
+    monkeypatch.setattr(blob_store, "save_upload", no_write)
+    second = asyncio.run(blob_store.store_upload(UploadFile(file=io.BytesIO(PDF), filename="b.pdf")))
+    assert second["deduplicated"] is True
+    assert second["file_path"] == first["file_path"]
+
+
+def test_registered_blob_missing_on_disk_is_rewritten(registered):
+    stored = asyncio.run(blob_store.store_upload(UploadFile(file=io.BytesIO(PDF), filename="a.pdf")))
+    os.remove(stored["file_path"])
+    again = asyncio.run(blob_store.store_upload(UploadFile(file=io.BytesIO(PDF), filename="a.pdf")))
+    assert again["deduplicated"] is False
+    assert os.path.exists(again["file_path"])
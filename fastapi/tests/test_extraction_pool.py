@@ -0,0 +1,66 @@
+import time
+import asyncio
+
+import pytest
+
+import pdf_text
+from extraction_pool import ExtractionMemoryExceeded, ExtractionPool, ExtractionTimeout
+
+
+def allocate_too_much() -> int:
+    # Runs in a worker process limited to 256 MB
+    return len(bytearray(1024 * 1024 * 1024))
+
+
+def sleep_and_return(seconds: float, value: int) -> int:
+    time.sleep(seconds)
+    return value
+
+
+async def run_behind_slow_job(pool, slow_timeout, during_slow_job=None):
+    """Queue five quick jobs behind one slow job on a single-worker pool."""
+    slow = asyncio.ensure_future(pool.run(sleep_and_return, 2, -1, timeout=slow_timeout))
+    await asyncio.sleep(0.5)
+    quick = [asyncio.ensure_future(pool.run(sleep_and_return, 0, i, timeout=30)) for i in range(5)]
+    await asyncio.sleep(0.1)
+    if during_slow_job:
+        during_slow_job()
+    return await asyncio.gather(slow, *quick, return_exceptions=True)
+
+
+def test_extract_text_reraises_memory_error(monkeypatch, tmp_path):
+    def out_of_memory(*args, **kwargs):
+        raise MemoryError()
+        yield
+
+    monkeypatch.setattr(pdf_text, "iter_pdf_pages", out_of_memory)
+    with pytest.raises(MemoryError):
+        pdf_text.extract_text_from_pdf(str(tmp_path / "big.pdf"))
+
+
+def test_pool_reports_memory_limit():
+    pool = ExtractionPool(1, 60, 5, memory_limit_mb=256)
+    try:
+        with pytest.raises(ExtractionMemoryExceeded):
+            asyncio.run(pool.run(allocate_too_much))
+    finally:
+        pool.shutdown()
+
+
+def test_timeout_kill_retries_queued_jobs():
+    pool = ExtractionPool(1, 60, 50)
+    try:
+        results = asyncio.run(run_behind_slow_job(pool, slow_timeout=1))
+    finally:
+        pool.shutdown()
+    assert isinstance(results[0], ExtractionTimeout)
+    assert results[1:] == [0, 1, 2, 3, 4]
+
+
+def test_restart_lets_queued_jobs_finish():
+    pool = ExtractionPool(1, 60, 50)
+    try:
+        results = asyncio.run(run_behind_slow_job(pool, slow_timeout=30, during_slow_job=pool._restart))
+    finally:
+        pool.shutdown()
+    assert results == [-1, 0, 1, 2, 3, 4]
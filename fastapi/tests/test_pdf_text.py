@@ -0,0 +1,24 @@
+import pytest
+
+from pdf_text import parse_page_range
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, None),
+    ("", None),
+    ("  ", None),
+    ("7", (7, 7)),
+    ("41-60", (41, 60)),
+    (" 41 - 60 ", (41, 60)),
+    ("41–60", (41, 60)),
+    ("41-", (41, None)),
+    ("5-5", (5, 5)),
+])
+def test_parse_page_range(value, expected):
+    assert parse_page_range(value) == expected
+
+
+@pytest.mark.parametrize("value", ["0", "0-3", "-5", "10-4", "a-b", "3-x", "1-2-3", "1,3"])
+def test_parse_page_range_rejects_malformed_ranges(value):
+    with pytest.raises(ValueError, match="Invalid page range"):
+        parse_page_range(value)
@@ -0,0 +1,82 @@
+import json
+
+from quiz_parser import QuizStreamParser, normalize_question, parse_quiz_questions
+
+QUESTIONS = [
+    {
+        "question": 'What does "{x}" print?',
+        "options": {"A": "a [1]", "B": "b \\ c", "C": "{}", "D": "d"},
+        "correct_answer": "C",
+        "explanation": "Braces in strings are not structure.",
+    },
+    {
+        "question": "Second?",
+        "options": ["one", "two", "three", "four"],
+        "correct_answer": "b",
+        "explanation": "",
+    },
+]
+
+
+def feed_in_chunks(text: str, size: int):
+    parser = QuizStreamParser()
+    items = []
+    for start in range(0, len(text), size):
+        items.extend(parser.feed(text[start:start + size]))
+    return parser, items
+
+
+def test_every_split_point_yields_the_same_questions():
+    text = json.dumps({"questions": QUESTIONS})
+    for size in range(1, 12):
+        parser, items = feed_in_chunks(text, size)
+        assert items == QUESTIONS
+        assert parser.broken == 0
+
+
+def test_questions_are_emitted_when_their_brace_arrives():
+    text = json.dumps({"questions": QUESTIONS})
+    first_end = text.index(', {"question": "Second?"')
+    parser = QuizStreamParser()
+    assert parser.feed(text[:first_end - 1]) == []
+    assert parser.feed(text[first_end - 1:first_end]) == [QUESTIONS[0]]
+    assert parser.feed(text[first_end:]) == [QUESTIONS[1]]
+
+
+def test_bare_array_and_surrounding_text():
+    text = "Here is your quiz:\n```json\n" + json.dumps(QUESTIONS) + "\n```\nGood luck {!}"
+    parser, items = feed_in_chunks(text, 7)
+    assert items == QUESTIONS
+
+
+def test_escaped_quotes_and_backslashes_do_not_end_strings():
+    item = {"question": 'a \\" } ] \\\\', "options": {}}
+    parser, items = feed_in_chunks(json.dumps([item]), 3)
+    assert items == [item]
+
+
+def test_broken_object_is_counted_and_parsing_continues():
+    text = '[{"question": "ok"}, {"question": bad}, {"question": "also ok"}]'
+    parser = QuizStreamParser()
+    assert parser.feed(text) == [{"question": "ok"}, {"question": "also ok"}]
+    assert parser.broken == 1
+
+
+def test_normalize_question():
+    assert normalize_question(QUESTIONS[1]) == {
+        "question": "Second?",
+        "options": {"A": "one", "B": "two", "C": "three", "D": "four"},
+        "correct_answer": "B",
+        "explanation": "",
+    }
+    assert normalize_question({**QUESTIONS[0], "correct_answer": "E"}) is None
+    assert normalize_question({**QUESTIONS[0], "options": {"A": "a", "B": "b"}}) is None
+    assert normalize_question({**QUESTIONS[0], "question": "  "}) is None
+    assert normalize_question("not a dict") is None
+
+
+def test_parse_quiz_questions_counts_invalid_and_broken():
+    text = json.dumps([QUESTIONS[0], {"question": "no options"}])[:-1] + ', {"oops": }]'
+    questions, invalid = parse_quiz_questions(text)
+    assert [q["question"] for q in questions] == [QUESTIONS[0]["question"]]
+    assert invalid == 2
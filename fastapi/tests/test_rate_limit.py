@@ -0,0 +1,122 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import rate_limit
+from rate_limit import RateGovernor, RateLimitExceeded, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    real_sleep = asyncio.sleep
+
+    async def sleep(seconds):
+        clock.now += seconds
+        await real_sleep(0)
+
+    # Only rate_limit's view of the clock is faked, not the event loop's
+    monkeypatch.setattr(rate_limit, "time", clock)
+    monkeypatch.setattr(rate_limit, "asyncio", SimpleNamespace(Lock=asyncio.Lock, sleep=sleep))
+    return clock
+
+
+def test_bucket_refills_continuously_up_to_capacity(clock):
+    bucket = TokenBucket(60)
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    clock.now += 0.5
+    assert bucket.wait_time(1) == pytest.approx(0.5)
+    clock.now += 3600
+    assert bucket.available() == 60
+
+
+def test_drain_empties_the_bucket_for_the_given_time(clock):
+    bucket = TokenBucket(60)
+    bucket.drain(5)
+    assert bucket.wait_time(1) == pytest.approx(6.0)
+    clock.now += 6
+    assert bucket.wait_time(1) == 0
+
+
+def test_retry_after_is_rounded_up_to_whole_seconds():
+    assert RateLimitExceeded(0.2).retry_after == 1
+    assert RateLimitExceeded(4.01).headers == {"Retry-After": "5"}
+
+
+def test_acquire_waits_for_the_budget_to_refill(clock):
+    governor = RateGovernor(rpm=60, tpm=100000, max_wait_seconds=10, max_queue=10)
+
+    async def run():
+        for _ in range(61):
+            await governor.acquire(10)
+
+    asyncio.run(run())
+    assert clock.now == pytest.approx(1001.0)
+    assert governor.admitted == 61
+    assert governor.delayed == 1
+    assert governor.stats()["avg_wait_seconds"] == pytest.approx(1.0)
+
+
+def test_token_budget_is_enforced_and_oversized_calls_still_fit(clock):
+    governor = RateGovernor(rpm=1000, tpm=6000, max_wait_seconds=60, max_queue=10)
+
+    async def run():
+        await governor.acquire(10 ** 6)
+        await governor.acquire(3000)
+
+    asyncio.run(run())
+    # The first call emptied the bucket; 3000 tokens refill in 30 seconds
+    assert clock.now == pytest.approx(1030.0)
+
+
+def test_call_that_would_wait_too_long_is_rejected_with_retry_after(clock):
+    governor = RateGovernor(rpm=60, tpm=100000, max_wait_seconds=10, max_queue=10)
+    governor.penalize(30)
+    with pytest.raises(RateLimitExceeded) as raised:
+        asyncio.run(governor.acquire(10))
+    assert raised.value.retry_after == 31
+    assert clock.now == 1000.0
+    assert governor.rejected == 1
+    assert governor.waiting == 0
+
+
+def test_full_queue_rejects_immediately(clock):
+    governor = RateGovernor(rpm=60, tpm=100000, max_wait_seconds=10, max_queue=0)
+    with pytest.raises(RateLimitExceeded):
+        asyncio.run(governor.acquire(10))
+    assert governor.admitted == 0
+
+
+def test_queued_callers_are_admitted_in_arrival_order(clock):
+    governor = RateGovernor(rpm=60, tpm=100000, max_wait_seconds=10, max_queue=10)
+    governor.requests.take(60)
+    order = []
+
+    async def call(name):
+        await governor.acquire(10)
+        order.append(name)
+
+    async def run():
+        await asyncio.gather(*(call(name) for name in "abc"))
+
+    asyncio.run(run())
+    assert order == ["a", "b", "c"]
+    assert clock.now == pytest.approx(1003.0)
+
+
+def test_settle_charges_overruns_but_does_not_refund(clock):
+    governor = RateGovernor(rpm=60, tpm=1000, max_wait_seconds=10, max_queue=10)
+    governor.settle(100, 400)
+    assert governor.tokens.available() == 700
+    governor.settle(400, 100)
+    assert governor.tokens.available() == 700
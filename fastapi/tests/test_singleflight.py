@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "summary"
+
+    async def run():
+        return await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+
+    assert asyncio.run(run()) == ["summary"] * 5
+    assert calls == 1
+    assert flight.stats() == {"executed": 1, "coalesced": 4, "coalesced_rate": 0.8, "in_flight": 0}
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+
+    async def run():
+        return await asyncio.gather(
+            flight.do("a", lambda: asyncio.sleep(0, "a")),
+            flight.do("b", lambda: asyncio.sleep(0, "b")),
+        )
+
+    assert asyncio.run(run()) == ["a", "b"]
+    assert flight.executed == 2
+
+
+def test_leader_failure_reaches_every_caller_and_is_not_cached():
+    flight = SingleFlight()
+    attempts = 0
+
+    async def fails_once():
+        nonlocal attempts
+        attempts += 1
+        await asyncio.sleep(0.01)
+        if attempts == 1:
+            raise RuntimeError("model error")
+        return "ok"
+
+    async def run():
+        results = await asyncio.gather(*(flight.do("key", fails_once) for _ in range(3)), return_exceptions=True)
+        return results, await flight.do("key", fails_once)
+
+    results, retried = asyncio.run(run())
+    assert [type(r) for r in results] == [RuntimeError] * 3
+    assert retried == "ok"
+    assert attempts == 2
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_work():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def run():
+        first = asyncio.ensure_future(flight.do("key", work))
+        second = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "done"
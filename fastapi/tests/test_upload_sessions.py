@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+from starlette.requests import ClientDisconnect
+
+import upload_sessions
+from upload_sessions import UploadOffsetMismatch, append_chunk
+
+
+class FakeSessionTable:
+    """Just enough of the upload_sessions table for append_chunk."""
+
+    def __init__(self):
+        self.received = {}
+
+    async def execute(self, query, values):
+        if self.received[values["id"]] == values["offset"]:
+            self.received[values["id"]] = values["received"]
+
+    async def fetch_val(self, query, values):
+        return self.received[values["id"]]
+
+
+@pytest.fixture
+def table(monkeypatch):
+    table = FakeSessionTable()
+    monkeypatch.setattr(upload_sessions, "database", table)
+    return table
+
+
+@pytest.fixture
+def session(table, tmp_path):
+    path = tmp_path / "s.part"
+    path.write_bytes(b"")
+    table.received["s"] = 0
+    return {"id": "s", "staging_path": str(path), "total_bytes": 10, "received_bytes": 0}
+
+
+def current(session, table):
+    return {**session, "received_bytes": table.received[session["id"]]}
+
+
+async def body(*chunks, disconnect=False):
+    for chunk in chunks:
+        yield chunk
+    if disconnect:
+        raise ClientDisconnect()
+
+
+def staged(session) -> bytes:
+    with open(session["staging_path"], "rb") as f:
+        return f.read()
+
+
+def test_chunks_are_appended_at_their_offset(session, table):
+    assert asyncio.run(append_chunk(session, 0, body(b"abc", b"", b"de"))) == 5
+    assert asyncio.run(append_chunk(current(session, table), 5, body(b"fghij"))) == 10
+    assert staged(session) == b"abcdefghij"
+
+
+def test_wrong_offset_is_rejected_with_the_current_one(session, table):
+    asyncio.run(append_chunk(session, 0, body(b"abc")))
+    with pytest.raises(UploadOffsetMismatch) as raised:
+        asyncio.run(append_chunk(current(session, table), 5, body(b"xyz")))
+    assert raised.value.offset == 3
+    assert staged(session) == b"abc"
+
+
+def test_chunk_past_the_declared_size_keeps_what_fit(session, table):
+    with pytest.raises(ValueError):
+        asyncio.run(append_chunk(session, 0, body(b"abcd", b"efghijk")))
+    assert table.received["s"] == 4
+
+
+def test_cut_off_body_records_the_bytes_that_arrived(session, table):
+    with pytest.raises(ClientDisconnect):
+        asyncio.run(append_chunk(session, 0, body(b"abc", b"de", disconnect=True)))
+    assert table.received["s"] == 5
+    assert staged(session) == b"abcde"
+
+
+def test_retried_chunk_after_a_lost_response_is_harmless(session, table):
+    # The client never saw the first response and sends the same chunk again
+    # with the session row it read before
+    asyncio.run(append_chunk(session, 0, body(b"abc")))
+    assert asyncio.run(append_chunk(session, 0, body(b"abc"))) == 3
+    assert staged(session) == b"abc"
+
+
+def test_overlapping_append_with_different_length_is_rejected(session, table):
+    asyncio.run(append_chunk(session, 0, body(b"abcd")))
+    with pytest.raises(UploadOffsetMismatch) as raised:
+        asyncio.run(append_chunk(session, 0, body(b"ab")))
+    assert raised.value.offset == 4
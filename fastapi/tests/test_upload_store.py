@@ -0,0 +1,91 @@
+import io
+import asyncio
+import hashlib
+
+import pytest
+from fastapi import FastAPI, UploadFile
+from fastapi.testclient import TestClient
+
+from upload_store import NotAPdf, UploadSizeLimitMiddleware, UploadTooLarge, hash_upload
+
+LIMIT = 64 * 1024
+
+
+def make_client():
+    app = FastAPI()
+    app.add_middleware(UploadSizeLimitMiddleware, max_body_bytes=LIMIT)
+    app.state.calls = 0
+
+    @app.post("/api/files/upload")
+    async def upload(file: UploadFile):
+        app.state.calls += 1
+        return {"size": len(await file.read())}
+
+    return app, TestClient(app)
+
+
+def multipart_body(size: int):
+    boundary = "testboundary"
+    head = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="a.pdf"\r\n'
+        "Content-Type: application/pdf\r\n\r\n"
+    ).encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+    return head + b"%PDF-" + b"x" * (size - 5) + tail, f"multipart/form-data; boundary={boundary}"
+
+
+def chunked(body: bytes, chunk_size: int = 8 * 1024):
+    for start in range(0, len(body), chunk_size):
+        yield body[start:start + chunk_size]
+
+
+def test_small_upload_passes():
+    app, client = make_client()
+    body, content_type = multipart_body(1000)
+    response = client.post("/api/files/upload", content=body, headers={"Content-Type": content_type})
+    assert response.status_code == 200
+    assert response.json() == {"size": 1000}
+
+
+def test_large_content_length_is_refused_unread():
+    app, client = make_client()
+    body, content_type = multipart_body(LIMIT * 2)
+    response = client.post("/api/files/upload", content=body, headers={"Content-Type": content_type})
+    assert response.status_code == 413
+    assert app.state.calls == 0
+
+
+def test_chunked_body_is_cut_off_past_the_limit():
+    app, client = make_client()
+    body, content_type = multipart_body(LIMIT * 2)
+    response = client.post("/api/files/upload", content=chunked(body), headers={"Content-Type": content_type})
+    assert response.status_code == 413
+    assert app.state.calls == 0
+
+
+def test_other_paths_are_not_limited():
+    app, client = make_client()
+
+    @app.post("/api/files/other")
+    async def other(file: UploadFile):
+        return {"size": len(await file.read())}
+
+    body, content_type = multipart_body(LIMIT * 2)
+    response = client.post("/api/files/other", content=chunked(body), headers={"Content-Type": content_type})
+    assert response.status_code == 200
+
+
+def test_hash_upload_rewinds_the_file():
+    data = b"%PDF-1.7" + b"x" * 3_000_000
+    upload = UploadFile(file=io.BytesIO(data), filename="a.pdf")
+    stored = asyncio.run(hash_upload(upload))
+    assert stored == {"content_sha256": hashlib.sha256(data).hexdigest(), "size_bytes": len(data)}
+    assert asyncio.run(upload.read()) == data
+
+
+def test_hash_upload_rejects_non_pdf_and_oversized_files():
+    with pytest.raises(NotAPdf):
+        asyncio.run(hash_upload(UploadFile(file=io.BytesIO(b"x" * 2000), filename="a.pdf")))
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(hash_upload(UploadFile(file=io.BytesIO(b"%PDF-" + b"x" * 2000), filename="a.pdf"), max_bytes=1000))
@@ -0,0 +1,195 @@
+import os
+import uuid
+import asyncio
+import logging
+from typing import AsyncIterator
+
+from database import database
+from upload_store import PDF_HEADER_WINDOW, PDF_MAGIC, UPLOAD_DIR
+
+logger = logging.getLogger(__name__)
+
+# Partial uploads are written here until they are finalized
+UPLOAD_SESSION_DIR = os.path.join(UPLOAD_DIR, "sessions")
+# Sessions without activity for this long are deleted, with their partial file
+UPLOAD_SESSION_TTL_SECONDS = int(os.getenv("UPLOAD_SESSION_TTL_SECONDS", "86400"))
+
+
+class UploadOffsetMismatch(Exception):
+    """The client's offset is not where the session's data ends."""
+
+    def __init__(self, offset: int):
+        self.offset = offset
+        super().__init__(f"Upload is at offset {offset}")
+
+
+async def ensure_upload_sessions_table():
+    await database.execute(
+        """
+        CREATE TABLE IF NOT EXISTS upload_sessions (
+            id CHAR(32) PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+            name VARCHAR(255) NOT NULL,
+            total_bytes BIGINT NOT NULL,
+            received_bytes BIGINT NOT NULL DEFAULT 0,
+            staging_path VARCHAR(500) NOT NULL,
+            status VARCHAR(20) NOT NULL DEFAULT 'open', -- open, finalizing, finalized
+            file_id INTEGER REFERENCES pdf_files(id) ON DELETE SET NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    await database.execute("CREATE INDEX IF NOT EXISTS idx_upload_sessions_updated ON upload_sessions(updated_at)")
+
+
+def _create_staging_file(path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+
+
+async def create_upload_session(user_id: int, name: str, total_bytes: int):
+    session_id = uuid.uuid4().hex
+    staging_path = os.path.join(UPLOAD_SESSION_DIR, f"{session_id}.part")
+    await asyncio.to_thread(_create_staging_file, staging_path)
+    query = """
+    INSERT INTO upload_sessions (id, user_id, name, total_bytes, staging_path)
+    VALUES (:id, :user_id, :name, :total_bytes, :staging_path)
+    RETURNING *
+    """
+    values = {
+        "id": session_id,
+        "user_id": user_id,
+        "name": name,
+        "total_bytes": total_bytes,
+        "staging_path": staging_path,
+    }
+    return await database.fetch_one(query=query, values=values)
+
+
+async def get_upload_session(session_id: str):
+    query = "SELECT * FROM upload_sessions WHERE id = :id"
+    return await database.fetch_one(query=query, values={"id": session_id})
+
+
+def _write_at(file, offset: int, chunk: bytes) -> None:
+    file.seek(offset)
+    file.write(chunk)
+
+
+def _sync_and_close(file) -> None:
+    file.flush()
+    os.fsync(file.fileno())
+    file.close()
+
+
+async def append_chunk(session, offset: int, chunks: AsyncIterator[bytes]) -> int:
+    """
+    Write a request body to the session's staging file at offset.
+
+    The offset must equal the bytes already received; writes are positional,
+    so a client retrying the same chunk after a lost response is harmless.
+    If the body stops early (e.g. the connection dropped), the bytes that
+    did arrive are kept and the client resumes from the returned offset.
+
+    Args:
+        session: The upload_sessions row
+        offset (int): Where the client says this chunk starts
+        chunks: The request body
+
+    Returns:
+        int: The new offset (bytes received so far)
+
+    Raises:
+        UploadOffsetMismatch: If offset is not the session's current offset
+        ValueError: If the chunk would run past the declared size
+    """
+    if offset != session["received_bytes"]:
+        raise UploadOffsetMismatch(session["received_bytes"])
+
+    written = 0
+    file = await asyncio.to_thread(open, session["staging_path"], "r+b")
+    try:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            if offset + written + len(chunk) > session["total_bytes"]:
+                raise ValueError("Chunk runs past the declared upload size")
+            await asyncio.to_thread(_write_at, file, offset + written, chunk)
+            written += len(chunk)
+    finally:
+        # Record what reached the disk even when the body was cut off, so
+        # the client can resume from there
+        await asyncio.to_thread(_sync_and_close, file)
+        if written:
+            await database.execute(
+                query="""
+                UPDATE upload_sessions
+                SET received_bytes = :received, updated_at = NOW()
+                WHERE id = :id AND received_bytes = :offset
+                """,
+                values={"id": session["id"], "offset": offset, "received": offset + written},
+            )
+
+    current = await database.fetch_val(
+        query="SELECT received_bytes FROM upload_sessions WHERE id = :id", values={"id": session["id"]}
+    )
+    if current != offset + written:
+        # Another request appended at the same offset first
+        raise UploadOffsetMismatch(current)
+    return current
+
+
+async def begin_finalize(session_id: str):
+    """
+    Claim a fully received session for finalizing. Returns the row, or None
+    if the session is incomplete or another request is already finalizing it.
+    """
+    query = """
+    UPDATE upload_sessions
+    SET status = 'finalizing', updated_at = NOW()
+    WHERE id = :id AND status = 'open' AND received_bytes = total_bytes
+    RETURNING *
+    """
+    return await database.fetch_one(query=query, values={"id": session_id})
+
+
+async def mark_upload_finalized(session_id: str, file_id: int):
+    query = """
+    UPDATE upload_sessions
+    SET status = 'finalized', file_id = :file_id, updated_at = NOW()
+    WHERE id = :id
+    """
+    await database.execute(query=query, values={"id": session_id, "file_id": file_id})
+
+
+def has_pdf_header(path: str) -> bool:
+    with open(path, "rb") as f:
+        return PDF_MAGIC in f.read(PDF_HEADER_WINDOW)
+
+
+async def delete_upload_session(session) -> None:
+    await database.execute(query="DELETE FROM upload_sessions WHERE id = :id", values={"id": session["id"]})
+    try:
+        await asyncio.to_thread(os.remove, session["staging_path"])
+    except FileNotFoundError:
+        pass
+
+
+async def collect_abandoned_upload_sessions(ttl_seconds: int = UPLOAD_SESSION_TTL_SECONDS) -> int:
+    """Delete sessions idle for ttl_seconds and their partial files. Returns how many were deleted."""
+    rows = await database.fetch_all(
+        query="""
+        DELETE FROM upload_sessions
+        WHERE updated_at < NOW() - make_interval(secs => CAST(:ttl AS DOUBLE PRECISION))
+        RETURNING staging_path
+        """,
+        values={"ttl": ttl_seconds},
+    )
+    for row in rows:
+        # Finalized sessions' staging files were already moved to the blob store
+        try:
+            await asyncio.to_thread(os.remove, row["staging_path"])
+        except FileNotFoundError:
+            pass
+    return len(rows)
@@ -0,0 +1,165 @@
+import os
+import uuid
+import asyncio
+import hashlib
+import logging
+from datetime import datetime
+
+from fastapi import UploadFile
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = "uploads"
+# Largest PDF accepted by /files/upload
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+# Room for the multipart boundaries and form fields around the PDF
+UPLOAD_FORM_OVERHEAD_BYTES = 64 * 1024
+
+# PDF readers accept the header anywhere in the first 1024 bytes
+PDF_MAGIC = b"%PDF-"
+PDF_HEADER_WINDOW = 1024
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class NotAPdf(Exception):
+    pass
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Reject /files/upload request bodies larger than the upload limit with 413.
+
+    FastAPI parses the multipart form, spooling the file to disk, before the
+    route runs, so the limit is enforced while the body is received: a larger
+    Content-Length is refused unread, and a chunked body is cut off as soon as
+    it passes the limit. Other requests go straight through.
+    """
+
+    def __init__(self, app, max_body_bytes: int = MAX_UPLOAD_BYTES + UPLOAD_FORM_OVERHEAD_BYTES):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].endswith("/files/upload"):
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > self.max_body_bytes:
+            await self._reject(scope, receive, send)
+            return
+
+        received = 0
+        too_large = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, too_large
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    too_large = True
+                    raise UploadTooLarge("Request body is larger than the upload limit")
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            # Whatever error the app makes of the aborted body is replaced below
+            if too_large:
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not too_large:
+                raise
+        if too_large and not response_started:
+            await self._reject(scope, receive, send)
+
+    async def _reject(self, scope, receive, send):
+        response = JSONResponse(
+            status_code=413,
+            content={"detail": f"File is larger than {MAX_UPLOAD_BYTES // (1024 * 1024)} MB"},
+        )
+        await response(scope, receive, send)
+
+
+def new_upload_path() -> str:
+    unique_name = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex}.pdf"
+    return os.path.join(UPLOAD_DIR, unique_name)
+
+
+async def hash_upload(upload: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> dict:
+    """
+    Hash an uploaded file where FastAPI spooled it, then rewind it.
+
+    Reads in chunks without blocking the event loop, and stops as soon as the
+    file exceeds max_bytes or does not start like a PDF. Nothing is written,
+    so a file that is already stored never touches the upload directory.
+
+    Args:
+        upload (UploadFile): The uploaded file
+        max_bytes (int): Size limit
+
+    Returns:
+        dict: Contains 'content_sha256' and 'size_bytes'
+
+    Raises:
+        UploadTooLarge: If the file is larger than max_bytes
+        NotAPdf: If the file does not have a PDF header
+    """
+    sha = hashlib.sha256()
+    size = 0
+    header = b""
+    while True:
+        chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        if len(header) < PDF_HEADER_WINDOW:
+            header += chunk[:PDF_HEADER_WINDOW - len(header)]
+            if len(header) >= PDF_HEADER_WINDOW and PDF_MAGIC not in header:
+                raise NotAPdf("File is not a PDF")
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLarge(f"File is larger than {max_bytes // (1024 * 1024)} MB")
+        # hashlib releases the GIL on large buffers, so this runs truly off-loop
+        await asyncio.to_thread(sha.update, chunk)
+    if PDF_MAGIC not in header:
+        raise NotAPdf("File is not a PDF")
+    await upload.seek(0)
+    return {"content_sha256": sha.hexdigest(), "size_bytes": size}
+
+
+async def save_upload(upload: UploadFile, dest_path: str) -> None:
+    """
+    Copy an uploaded file to dest_path in chunks, without blocking the event loop.
+
+    The data goes to a temporary file that is renamed into place once the
+    copy is complete, so dest_path never holds a partial file.
+    """
+    tmp_path = f"{dest_path}.{uuid.uuid4().hex}.part"
+    file = await asyncio.to_thread(open, tmp_path, "wb")
+    try:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            await asyncio.to_thread(file.write, chunk)
+        await asyncio.to_thread(file.close)
+        await asyncio.to_thread(os.replace, tmp_path, dest_path)
+    except BaseException:
+        await asyncio.to_thread(file.close)
+        try:
+            await asyncio.to_thread(os.remove, tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Standalone worker that runs queued AI jobs (summaries, quizzes, ...).
+
+Run one or more of these next to the API, on any number of nodes:
+
+    python worker.py
+"""
+import os
+import json
+import socket
+import signal
+import asyncio
+import logging
+
+from ai_utils import ingest_pdf, summarize_pdf, generate_quiz_from_pdf, validate_page_range
+from blob_store import collect_unreferenced_blobs, ensure_pdf_blobs_table
+from database import (
+    connect_db, disconnect_db, ensure_pdf_ingest_columns, ensure_pdf_summaries_table,
+    ensure_summary_detail_columns, get_pdf_file,
+    adopt_stored_summary, get_stored_summary, save_pdf_summary, save_pdf_ingest_result, set_pdf_ingest_status,
+)
+from extraction_pool import ExtractionMemoryExceeded, extraction_pool
+from jobs import (
+    ensure_ai_jobs_table, claim_job, complete_job, defer_job, fail_job,
+    heartbeat_job, requeue_stale_jobs, update_job_progress,
+)
+from llm_client import OPENAI_MODEL, close_client
+from pdf_text import parse_page_range
+from question_bank import ensure_question_bank_table, quiz_from_bank
+from rate_limit import RateLimitExceeded
+from upload_sessions import collect_abandoned_upload_sessions, ensure_upload_sessions_table
+
+logger = logging.getLogger("worker")
+
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "4"))
+WORKER_POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", "1"))
+# A running job whose heartbeat is older than this is handed to another worker
+WORKER_STALE_SECONDS = int(os.getenv("WORKER_STALE_SECONDS", "600"))
+# How often a running job's lease is refreshed; well under WORKER_STALE_SECONDS
+WORKER_HEARTBEAT_SECONDS = float(os.getenv("WORKER_HEARTBEAT_SECONDS", str(min(30, WORKER_STALE_SECONDS / 4))))
+
+
+class PermanentJobError(Exception):
+    """A job failure that retrying cannot fix (missing file, bad input)."""
+
+
+async def _load_file(file_id: int):
+    file_record = await get_pdf_file(file_id)
+    if not file_record:
+        raise PermanentJobError("File not found")
+    if not os.path.exists(file_record["file_path"]):
+        raise PermanentJobError("PDF file not found on disk")
+    return file_record
+
+
+async def run_summarize_job(job_id: int, payload: dict) -> dict:
+    file_id = payload["file_id"]
+    max_length = payload.get("max_length", 500)
+    page_range = parse_page_range(payload.get("pages"))
+    regenerate = payload.get("regenerate", False)
+
+    file_record = await _load_file(file_id)
+    await validate_page_range(file_record["file_path"], page_range, file_record["page_count"])
+    if page_range is None and not regenerate:
+        stored = await get_stored_summary(file_id, max_length, OPENAI_MODEL)
+        if stored:
+            await adopt_stored_summary(file_record, max_length, OPENAI_MODEL, stored)
+            return {
+                "file_id": file_id,
+                "file_name": file_record["name"],
+                "pages": None,
+                "summary": stored["summary"],
+                "original_word_count": stored["source_word_count"],
+                "summary_word_count": len(stored["summary"].split()),
+                "cached": True,
+                "success": True
+            }
+
+    await update_job_progress(job_id, 10)
+    result = await summarize_pdf(file_record["file_path"], max_length, page_range, use_cache=not regenerate)
+    await update_job_progress(job_id, 90)
+    if page_range is None:
+        await save_pdf_summary(file_id, max_length, OPENAI_MODEL, result["summary"], result["word_count"])
+
+    return {
+        "file_id": file_id,
+        "file_name": file_record["name"],
+        "pages": payload.get("pages") if page_range else None,
+        "summary": result["summary"],
+        "original_word_count": result["word_count"],
+        "summary_word_count": result["summary_length"],
+        "cached": False,
+        "success": True
+    }
+
+
+async def run_generate_quiz_job(job_id: int, payload: dict) -> dict:
+    file_id = payload["file_id"]
+    file_record = await _load_file(file_id)
+
+    num_questions = payload.get("num_questions", 5)
+    difficulty = payload.get("difficulty", "medium")
+    page_range = parse_page_range(payload.get("pages"))
+    use_cache = not payload.get("regenerate", False)
+    await validate_page_range(file_record["file_path"], page_range, file_record["page_count"])
+
+    await update_job_progress(job_id, 10)
+    if page_range is None:
+        result = await quiz_from_bank(
+            file_id, file_record["file_path"], num_questions, difficulty, use_cache, file_record["word_count"]
+        )
+    else:
+        result = await generate_quiz_from_pdf(
+            file_record["file_path"], num_questions, difficulty, page_range, use_cache=use_cache
+        )
+
+    return {
+        "file_id": file_id,
+        "file_name": file_record["name"],
+        "quiz": result["quiz"],
+        "metadata": {
+            "source_word_count": result["source_word_count"],
+            "num_questions": result["num_questions"],
+            "difficulty": result["difficulty"],
+            "banked_questions": result.get("banked_questions", 0)
+        },
+        "success": True
+    }
+
+
+async def run_ingest_job(job_id: int, payload: dict) -> dict:
+    file_id = payload["file_id"]
+    try:
+        file_record = await _load_file(file_id)
+        await set_pdf_ingest_status(file_id, "processing")
+        result = await ingest_pdf(file_record["file_path"])
+    except Exception as e:
+        await set_pdf_ingest_status(file_id, "failed", str(e))
+        raise
+    await save_pdf_ingest_result(file_id, result["content_sha256"], result["page_count"], result["word_count"])
+    return {"file_id": file_id, **result}
+
+
+JOB_HANDLERS = {
+    "ingest": run_ingest_job,
+    "summarize": run_summarize_job,
+    "generate_quiz": run_generate_quiz_job,
+}
+
+
+async def heartbeat_loop(job_id: int, worker_id: str) -> None:
+    """Keep the job's lease fresh for as long as its handler runs."""
+    while True:
+        await asyncio.sleep(WORKER_HEARTBEAT_SECONDS)
+        try:
+            if not await heartbeat_job(job_id, worker_id):
+                logger.warning(f"Job {job_id} is no longer held by {worker_id}; its result will be discarded")
+                return
+        except Exception as e:
+            logger.error(f"Could not send heartbeat for job {job_id}: {str(e)}")
+
+
+async def run_job(job, worker_id: str) -> None:
+    handler = JOB_HANDLERS.get(job["kind"])
+    if handler is None:
+        await fail_job(job["id"], worker_id, f"Unknown job kind '{job['kind']}'", retryable=False)
+        return
+
+    heartbeat = asyncio.create_task(heartbeat_loop(job["id"], worker_id))
+    try:
+        result = await handler(job["id"], json.loads(job["payload"]))
+        heartbeat.cancel()
+        if await complete_job(job["id"], worker_id, result):
+            logger.info(f"Job {job['id']} ({job['kind']}) succeeded")
+        else:
+            logger.warning(f"Job {job['id']} ({job['kind']}) finished after losing its lease; result discarded")
+    except RateLimitExceeded as e:
+        # Out of OpenAI budget: try again once it has refilled, without
+        # counting this as a failed attempt
+        logger.warning(f"Job {job['id']} ({job['kind']}) deferred {e.retry_after}s by the rate limit")
+        await defer_job(job["id"], worker_id, e.retry_after, "Waiting for OpenAI rate limit")
+    except (PermanentJobError, ExtractionMemoryExceeded, ValueError, KeyError) as e:
+        logger.error(f"Job {job['id']} ({job['kind']}) failed permanently: {str(e)}")
+        await fail_job(job["id"], worker_id, str(e), retryable=False)
+    except Exception as e:
+        logger.error(f"Job {job['id']} ({job['kind']}) failed on attempt {job['attempts']}: {str(e)}")
+        await fail_job(job["id"], worker_id, str(e))
+    finally:
+        heartbeat.cancel()
+
+
+async def worker_loop(worker_id: str, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        try:
+            job = await claim_job(worker_id)
+        except Exception as e:
+            logger.error(f"Could not poll job queue: {str(e)}")
+            job = None
+        if job is None:
+            try:
+                await asyncio.wait_for(stop.wait(), WORKER_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        await run_job(job, worker_id)
+
+
+async def reaper_loop(stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        try:
+            requeued = await requeue_stale_jobs(WORKER_STALE_SECONDS)
+            if requeued:
+                logger.warning(f"Requeued {requeued} stale jobs")
+        except Exception as e:
+            logger.error(f"Could not requeue stale jobs: {str(e)}")
+        try:
+            removed = await collect_unreferenced_blobs()
+            if removed:
+                logger.info(f"Deleted {removed} unreferenced PDF blobs")
+        except Exception as e:
+            logger.error(f"Could not delete unreferenced blobs: {str(e)}")
+        try:
+            expired = await collect_abandoned_upload_sessions()
+            if expired:
+                logger.info(f"Deleted {expired} abandoned upload sessions")
+        except Exception as e:
+            logger.error(f"Could not delete abandoned upload sessions: {str(e)}")
+        try:
+            await asyncio.wait_for(stop.wait(), 60)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def main():
+    logging.basicConfig(level=logging.INFO)
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await connect_db()
+    await ensure_ai_jobs_table()
+    await ensure_pdf_ingest_columns()
+    await ensure_pdf_blobs_table()
+    await ensure_upload_sessions_table()
+    await ensure_pdf_summaries_table()
+    await ensure_summary_detail_columns()
+    await ensure_question_bank_table()
+    extraction_pool.start()
+    logger.info(f"Worker {worker_id} started with {WORKER_CONCURRENCY} slots")
+
+    try:
+        await asyncio.gather(
+            reaper_loop(stop),
+            *(worker_loop(f"{worker_id}-{i}", stop) for i in range(WORKER_CONCURRENCY)),
+        )
+    finally:
+        extraction_pool.shutdown()
+        await close_client()
+        await disconnect_db()
+        logger.info(f"Worker {worker_id} stopped")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())